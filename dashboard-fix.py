@@ -1,110 +1,1814 @@
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+from flask import Flask, render_template, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import base64
+import ast
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from multiprocessing import shared_memory
+
+from defect_rules import build_defect_lut, lookup_defects
 
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Native threads, not eventlet/gevent: capture, encoding and inference run in OS
+# threads and worker processes, which green threads would stall, and in this mode
+# the detection threads emit straight to clients (WebSocket via simple-websocket)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
-class YOLODetectionSystem:
-    def __init__(self, model_path="testing.pt"):
+class StructuredLogger:
+    """Non-blocking JSON-lines logger with a background writer and per-event rate limits"""
+    LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+    
+    def __init__(self, level='info', stream=None, max_queue=1000):
+        self.level = self.LEVELS.get(str(level).lower(), 20)
+        self.stream = stream or sys.stdout
+        self.records = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        
+        # event -> [last_emit_time, occurrences, suppressed_since_last_emit]
+        self.limits = {}
+        self.limits_lock = threading.Lock()
+        
+        self.thread = threading.Thread(target=self.write_records, name="log-writer", daemon=True)
+        self.thread.start()
+    
+    def set_level(self, level):
+        """Change the minimum level at runtime"""
+        level = str(level).lower()
+        if level not in self.LEVELS:
+            raise ValueError(f"Unknown log level: {level}")
+        self.level = self.LEVELS[level]
+    
+    def get_level(self):
+        """Return the current minimum level name"""
+        return next(name for name, value in self.LEVELS.items() if value == self.level)
+    
+    def is_enabled(self, level):
+        """Cheap check so hot paths can skip building debug fields"""
+        return self.LEVELS[level] >= self.level
+    
+    def log(self, level, event, rate_limit=None, sample=None, **fields):
+        """Queue a record; rate_limit is min seconds between records, sample logs every Nth"""
+        if not self.is_enabled(level):
+            return
+        
+        if rate_limit or sample:
+            now = time.time()
+            with self.limits_lock:
+                state = self.limits.setdefault(event, [0.0, 0, 0])
+                state[1] += 1
+                if ((rate_limit and now - state[0] < rate_limit) or
+                        (sample and (state[1] - 1) % sample != 0)):
+                    state[2] += 1
+                    return
+                if state[2]:
+                    fields['suppressed'] = state[2]
+                state[0] = now
+                state[2] = 0
+        
+        record = {'ts': datetime.now().isoformat(timespec='milliseconds'),
+                  'level': level, 'event': event}
+        record.update(fields)
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            # Never block the caller on a slow log sink
+            self.dropped += 1
+    
+    def debug(self, event, **fields):
+        self.log('debug', event, **fields)
+    
+    def info(self, event, **fields):
+        self.log('info', event, **fields)
+    
+    def warning(self, event, **fields):
+        self.log('warning', event, **fields)
+    
+    def error(self, event, **fields):
+        self.log('error', event, **fields)
+    
+    def write_records(self):
+        """Background writer: serialize and flush records off the detection threads"""
+        while True:
+            record = self.records.get()
+            if self.dropped:
+                record['log_dropped'], self.dropped = self.dropped, 0
+            try:
+                self.stream.write(json.dumps(record, default=str) + '\n')
+                self.stream.flush()
+            except Exception:
+                pass
+
+logger = StructuredLogger(level=os.environ.get('DASHBOARD_LOG_LEVEL', 'info'))
+
+# Inference backend ('torch', 'onnxruntime' or 'openvino', None = by file type) and
+# its settings. model_path picks the startup model, a MODEL_REGISTRY name or a path,
+# e.g. an INT8 artifact produced by quantize-report.py
+INFERENCE_CONFIG = {
+    'model_path': os.environ.get('DASHBOARD_MODEL'),
+    'backend': os.environ.get('DASHBOARD_BACKEND'),
+    'conf': 0.5,
+    'iou': 0.45,
+    'imgsz': 640,
+    'threads': None
+}
+
+# Tiled inference for small defects: the model input (frame or ROI mosaic) is split
+# into tile_size tiles overlapping by `overlap`, run batch_size tiles per call with up
+# to `concurrency` calls in parallel (ONNX Runtime only; other backends run them in
+# turn), and merged with cross-tile NMS. A pass over the whole image always runs too:
+# boxes cut by an inner tile edge are dropped, so large parts (the phone itself) are
+# only found in one piece there. Costs roughly one inference per tile plus one, so it
+# is off unless DASHBOARD_TILING=1
+TILING_CONFIG = {
+    'enabled': os.environ.get('DASHBOARD_TILING', '0') == '1',
+    'tile_size': 640,
+    'overlap': 0.2,
+    'batch_size': 4,
+    'concurrency': 1
+}
+
+# Two-stage cascade: every frame is screened at screen_imgsz with a low screen_conf
+# so nothing is missed, then only suspects are re-inspected at the full input size.
+# Suspected defects are re-checked on a square crop around the box (grown by
+# crop_margin of its size on every side, at least min_crop pixels); frames where the
+# screen found something but nothing above INFERENCE_CONFIG['conf'] are re-run whole.
+# Defect boxes only ever come from the second stage, so the verdict does too.
+# Confident PASS frames cost one small inference. Off unless DASHBOARD_CASCADE=1.
+# ONNX Runtime/OpenVINO graphs have a fixed input size, so the screening graph is a
+# second export of the .pt weights at screen_imgsz; given an already exported model
+# there is nothing smaller to screen with, and the cascade is skipped with a warning
+CASCADE_CONFIG = {
+    'enabled': os.environ.get('DASHBOARD_CASCADE', '0') == '1',
+    'screen_imgsz': int(os.environ.get('DASHBOARD_SCREEN_IMGSZ', 320)),
+    'screen_conf': 0.25,
+    'crop_margin': 1.0,
+    'min_crop': 160
+}
+
+# Warm-up before the model reports ready: `runs` dummy frames at the camera capture
+# resolution (see Station.initialize_camera), plus one full batch when batching, so
+# lazy allocation, layer fusing and kernel selection don't slow the first real parts
+WARMUP_CONFIG = {
+    'runs': 3,
+    'frame_size': (1280, 720)
+}
+
+# Models exported from .pt weights (ONNX, OpenVINO) are cached here, keyed by the
+# weights' SHA-256 and input size, so only the first start pays for the conversion
+MODEL_CACHE_CONFIG = {
+    'dir': os.environ.get('DASHBOARD_MODEL_CACHE', 'model-cache')
+}
+
+# Inference worker processes (0 = run the model in the pipeline thread). Frames
+# reach workers through a shared-memory ring of `slots` frames (default 2 per worker)
+POOL_CONFIG = {
+    'workers': int(os.environ.get('DASHBOARD_WORKERS', 0)),
+    'slots': None,
+    'startup_timeout': 300
+}
+
+# Micro-batching: up to max_batch frames (from one or more cameras) are run as one
+# batch, waiting at most max_wait_ms for the batch to fill. max_batch 1 disables it
+BATCH_CONFIG = {
+    'max_batch': int(os.environ.get('DASHBOARD_BATCH', 1)),
+    'max_wait_ms': 10
+}
+
+# Model registry: name -> weights or exported artifact, switchable at runtime from the
+# dashboard without restarting. DASHBOARD_MODELS overrides it as "name=path,name=path".
+# The startup model is INFERENCE_CONFIG['model_path'] (a registry name or a path),
+# else the first entry
+def parse_models(spec):
+    models = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, path = entry.partition('=')
+        models[name.strip()] = path.strip() or name.strip()
+    return models
+
+MODEL_REGISTRY = parse_models(os.environ.get('DASHBOARD_MODELS', '')) or {
+    'testing': 'testing.pt',
+    'new-oppo': 'new-oppo.pt'
+}
+
+# Camera stations served by this process: name -> settings (camera_index, optional
+# rois, see ROI_CONFIG). DASHBOARD_STATIONS overrides it as "name=camera,name=camera"
+# (camera index or stream URL)
+def parse_stations(spec):
+    stations = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, camera = entry.partition('=')
+        camera = camera.strip() or '0'
+        stations[name.strip()] = {'camera_index': int(camera) if camera.isdigit() else camera}
+    return stations
+
+STATIONS_CONFIG = parse_stations(os.environ.get('DASHBOARD_STATIONS', '')) or {
+    'station-1': {'camera_index': 0}
+}
+
+# HTTP/WebSocket server. `python dashboard-fix.py` serves with one threaded gunicorn
+# worker as set up in gunicorn.conf.py (`gunicorn` in this directory does the same).
+# DASHBOARD_DEBUG=1 runs the Werkzeug development server with the debugger and a
+# verbose request log instead. The reloader is never used: it imports this file
+# twice and would load the model twice
+SERVER_CONFIG = {
+    'host': os.environ.get('DASHBOARD_HOST', '0.0.0.0'),
+    'port': int(os.environ.get('DASHBOARD_PORT', 5000)),
+    'debug': os.environ.get('DASHBOARD_DEBUG', '0') == '1'
+}
+
+# Per-station subscription channels. A connection only receives the channels it
+# subscribes to: 'video' (JPEG frames + overlay), 'stats' (status and counters,
+# e.g. for the andon board) and 'detections' (per-frame boxes, e.g. for the MES bridge)
+CHANNELS = ('video', 'stats', 'detections')
+
+# Which class names count as SG-defects is set in defect_rules.py (DEFECT_RULES),
+# shared with quantize-report.py so both judge defects the same way
+
+# Regions of interest: only these areas of the frame ([x1, y1, x2, y2] in camera
+# pixels) go to the model, tiled into one input image; no ROIs = the whole frame.
+# ROIs may not overlap, since an object in both would be detected and counted twice.
+# Set per station in STATIONS_CONFIG ('rois') or drawn in the dashboard, which
+# saves them to `path` (these take precedence over STATIONS_CONFIG)
+ROI_CONFIG = {
+    'path': os.environ.get('DASHBOARD_ROIS', 'station-rois.json')
+}
+
+# Per-part counting: parts (non-defect classes) are tracked across frames by box
+# overlap, and each part gets exactly one PASS/NG verdict once it leaves the view.
+# A defect counts against the part it overlaps most; a defect overlapping no part is
+# tracked and counted as an NG part of its own, so no NG goes uncounted
+TRACKER_CONFIG = {
+    'iou_threshold': 0.3,     # minimum overlap to continue a track
+    'max_age': 15,            # frames a part may go unseen before it is counted
+    'min_hits': 3,            # frames a part must be seen in to be counted at all
+    'defect_min_frames': 1    # frames with a defect on the part for an NG verdict
+}
+
+# Motion gate: each frame is downsampled to `size` greyscale and compared with the
+# last frame that went through the model. If fewer than area_threshold of its pixels
+# changed by more than pixel_threshold grey levels, the last detections are reused
+# instead of running inference. max_skip forces a fresh inference every N frames
+GATE_CONFIG = {
+    'enabled': os.environ.get('DASHBOARD_GATE', '1') == '1',
+    'size': (80, 45),
+    'pixel_threshold': 12,
+    'area_threshold': 0.005,
+    'max_skip': 15
+}
+
+# Video rendering: with server_overlay off, boxes and the status panel are drawn
+# by the browser and the server only downscales and encodes the raw frame
+RENDER_CONFIG = {
+    'server_overlay': False,
+    'stream_width': 960,
+    'jpeg_quality': 85
+}
+
+# Status banner rectangle (x1, y1, x2, y2) for server-side overlays
+STATUS_BANNER = (5, 5, 650, 80)
+
+# Pipeline stage queues: maxsize and drop policy ('drop-oldest' or 'block')
+PIPELINE_CONFIG = {
+    'annotate': {'queue_size': 2, 'drop_policy': 'drop-oldest'},
+    'encode': {'queue_size': 2, 'drop_policy': 'drop-oldest'},
+    'emit': {'queue_size': 2, 'drop_policy': 'drop-oldest'},
+}
+
+class BoundedQueue:
+    """Bounded FIFO between pipeline stages with a drop policy"""
+    def __init__(self, maxsize=2, drop_policy='drop-oldest'):
+        if drop_policy not in ('drop-oldest', 'block'):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.maxsize = maxsize
+        self.drop_policy = drop_policy
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+    
+    def put(self, item, timeout=1.0):
+        """Add item, dropping the oldest or blocking while the queue is full"""
+        with self.condition:
+            if self.drop_policy == 'block':
+                self.condition.wait_for(lambda: len(self.items) < self.maxsize or self.closed, timeout)
+                if len(self.items) >= self.maxsize:
+                    self.dropped += 1
+                    return False
+            elif len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify_all()
+            return True
+    
+    def get(self, timeout=1.0):
+        """Take the next item, or None if nothing arrives within timeout"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed, timeout)
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+    
+    def close(self):
+        """Wake up all waiting producers and consumers"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+    
+    def __len__(self):
+        return len(self.items)
+
+class PipelineStage:
+    """Worker thread that takes items from its input, processes them and passes them on"""
+    def __init__(self, name, handler, input_queue, output_queue=None):
+        self.name = name
+        self.handler = handler
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.is_running = False
+        self.thread = None
+        
+        self.processed = 0
+        self.errors = 0
+        self.avg_ms = 0.0
+    
+    def start(self):
+        """Start stage worker"""
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, name=f"stage-{self.name}", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop stage worker"""
+        self.is_running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+    
+    def run(self):
+        """Process items until stopped"""
+        while self.is_running:
+            item = self.input_queue.get()
+            if item is None:
+                if self.input_queue.closed:
+                    break
+                continue
+            
+            start_time = time.perf_counter()
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                logger.error('stage_error', stage=self.name, error=str(e), rate_limit=5.0)
+                self.errors += 1
+                continue
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            
+            # Exponential moving average of per-item processing time
+            self.avg_ms = elapsed_ms if self.processed == 0 else 0.9 * self.avg_ms + 0.1 * elapsed_ms
+            self.processed += 1
+            
+            if result is not None and self.output_queue is not None:
+                self.output_queue.put(result)
+    
+    def get_stats(self):
+        """Return stage statistics"""
+        return {
+            'name': self.name,
+            'avg_ms': round(self.avg_ms, 1),
+            'processed': self.processed,
+            'dropped': getattr(self.input_queue, 'dropped', 0),
+            'queued': len(self.input_queue),
+            'errors': self.errors
+        }
+
+class FrameGrabber:
+    """Continuously grab camera frames into a single latest-frame slot"""
+    def __init__(self, camera, source='default'):
+        self.camera = camera
+        self.source = source
+        self.is_running = False
+        self.thread = None
+        
+        # Latest-frame slot: only the newest frame is kept, older ones are dropped
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = 0.0
+        self.seq = 0
+        
+        # Consumer side of the slot, used when the grabber feeds a pipeline stage
+        self.last_read_seq = 0
+        self.dropped = 0
+    
+    def start(self):
+        """Start grabber thread"""
+        self.is_running = True
+        self.thread = threading.Thread(target=self.grab_frames, name="stage-capture", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop grabber thread"""
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+    
+    def grab_frames(self):
+        """Read frames as fast as the camera delivers them"""
+        while self.is_running:
+            ret, frame = self.camera.read()
+            if not ret:
+                logger.warning('camera_read_failed')
+                break
+            
+            with self.condition:
+                self.frame = frame
+                self.timestamp = time.time()
+                self.seq += 1
+                self.condition.notify_all()
+        
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+    
+    def read_latest(self, last_seq=0, timeout=1.0):
+        """Wait for a frame newer than last_seq, return (seq, timestamp, frame) or None"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > last_seq or not self.is_running, timeout)
+            if self.seq <= last_seq:
+                return None
+            return self.seq, self.timestamp, self.frame
+    
+    def get(self, timeout=1.0):
+        """Take the freshest unread frame as a pipeline packet, or None"""
+        latest = self.read_latest(self.last_read_seq, timeout)
+        if latest is None:
+            return None
+        
+        seq, timestamp, frame = latest
+        if self.last_read_seq:
+            self.dropped += seq - self.last_read_seq - 1
+        self.last_read_seq = seq
+        return {'seq': seq, 'timestamp': timestamp, 'frame': frame, 'source': self.source}
+    
+    @property
+    def closed(self):
+        return not self.is_running
+    
+    def __len__(self):
+        return 1 if self.seq > self.last_read_seq else 0
+
+class FrameBroadcaster:
+    """Encode-once video fan-out that keeps only the newest pending frame per client"""
+    def __init__(self, socketio, event='video_frame', ack_timeout=2.0):
+        self.socketio = socketio
+        self.event = event
+        self.ack_timeout = ack_timeout
+        self.lock = threading.Lock()
+        self.clients = {}
+    
+    def add_client(self, sid):
+        """Register a connected viewer"""
+        with self.lock:
+            self.clients[sid] = {
+                'pending': None,
+                'in_flight': False,
+                'sent_at': 0.0,
+                'delivered': 0,
+                'dropped': 0
+            }
+    
+    def remove_client(self, sid):
+        """Forget a disconnected viewer"""
+        with self.lock:
+            self.clients.pop(sid, None)
+    
+    def has_viewers(self):
+        """True when at least one client is subscribed to video"""
+        return bool(self.clients)
+    
+    def publish(self, payload):
+        """Offer an already-encoded frame to every client"""
+        with self.lock:
+            sids = list(self.clients)
+            for sid in sids:
+                client = self.clients[sid]
+                if client['pending'] is not None:
+                    # Client has not taken the previous frame yet, replace it
+                    client['dropped'] += 1
+                client['pending'] = payload
+        for sid in sids:
+            self.send_pending(sid)
+    
+    def send_pending(self, sid):
+        """Send the pending frame unless the previous one is still in flight"""
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None or client['pending'] is None:
+                return
+            if client['in_flight']:
+                if time.time() - client['sent_at'] < self.ack_timeout:
+                    return
+                # Acknowledgement never came, count the frame as lost
+                client['dropped'] += 1
+            payload = client['pending']
+            client['pending'] = None
+            client['in_flight'] = True
+            client['sent_at'] = time.time()
+        
+        self.socketio.emit(self.event, payload, to=sid,
+                           callback=lambda *args: self.on_ack(sid))
+    
+    def on_ack(self, sid):
+        """Client confirmed receipt, release its next frame"""
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return
+            client['in_flight'] = False
+            client['delivered'] += 1
+        self.send_pending(sid)
+    
+    def get_stats(self):
+        """Return per-client delivered/dropped counters"""
+        with self.lock:
+            return [{'sid': sid, 'delivered': client['delivered'], 'dropped': client['dropped']}
+                    for sid, client in self.clients.items()]
+
+class Detections:
+    """Backend-neutral detections for one image: xyxy (N, 4), conf (N,), cls (N,) as numpy"""
+    def __init__(self, xyxy=None, conf=None, cls=None):
+        self.xyxy = np.zeros((0, 4), dtype=np.float32) if xyxy is None else xyxy
+        self.conf = np.zeros(0, dtype=np.float32) if conf is None else conf
+        self.cls = np.zeros(0, dtype=np.int64) if cls is None else cls
+    
+    def __len__(self):
+        return len(self.conf)
+
+def class_aware_nms(xyxy, conf, cls, iou_threshold):
+    """Indices kept by NMS run per class (boxes of different classes never suppress each other)"""
+    # Offset boxes per class so they can't overlap across classes, then one NMS call
+    offsets = cls[:, None].astype(np.float32) * (float(xyxy.max() - xyxy.min()) + 1)
+    nms_boxes = np.concatenate([xyxy[:, :2] + offsets, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+    keep = cv2.dnn.NMSBoxes(nms_boxes.tolist(), conf.tolist(), 0.0, iou_threshold)
+    return np.array(keep, dtype=np.int64).reshape(-1)
+
+def merge_detections(parts, iou_threshold):
+    """Concatenate several Detections of one image, with class-aware NMS where they overlap"""
+    parts = [boxes for boxes in parts if len(boxes)]
+    if not parts:
+        return Detections()
+    xyxy = np.concatenate([boxes.xyxy for boxes in parts]).astype(np.float32)
+    conf = np.concatenate([boxes.conf for boxes in parts]).astype(np.float32)
+    cls = np.concatenate([boxes.cls for boxes in parts]).astype(np.int64)
+    if len(parts) == 1:
+        return Detections(xyxy, conf, cls)
+    keep = class_aware_nms(xyxy, conf, cls, iou_threshold)
+    return Detections(xyxy[keep], conf[keep], cls[keep])
+
+class InferenceEngine:
+    """Common interface for inference backends"""
+    name = None
+    # Whether predict_batch may be called from several threads at once
+    thread_safe = False
+    
+    def __init__(self, model_path, conf=0.5, iou=0.45, imgsz=640, threads=None):
+        self.model_path = model_path
+        self.conf = conf
+        self.iou = iou
+        self.imgsz = imgsz
+        self.threads = threads
+        self.names = {}
+    
+    def predict(self, frame):
+        """Run the model on one BGR frame and return Detections"""
+        return self.predict_batch([frame])[0]
+    
+    def predict_batch(self, frames):
+        """Run the model on a list of BGR frames and return a list of Detections"""
+        raise NotImplementedError
+    
+    def warmup(self, frame_size, runs=1, batch_size=1):
+        """Run dummy frames through the model; returns the time taken in ms"""
+        width, height = frame_size
+        frame = np.full((height, width, 3), 114, dtype=np.uint8)
+        start_time = time.perf_counter()
+        for _ in range(runs):
+            self.predict_batch([frame])
+        if batch_size > 1:
+            self.predict_batch([frame] * batch_size)
+        return (time.perf_counter() - start_time) * 1000
+
+class TorchEngine(InferenceEngine):
+    """Ultralytics/PyTorch backend"""
+    name = 'torch'
+    
+    def __init__(self, model_path, **options):
+        super().__init__(model_path, **options)
+        from ultralytics import YOLO
+        
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
         self.model = YOLO(model_path)
+        self.names = self.model.names
+    
+    def predict_batch(self, frames):
+        results = self.model(list(frames), conf=self.conf, iou=self.iou, imgsz=self.imgsz, verbose=False)
+        detections = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                detections.append(Detections())
+                continue
+            # One device->host transfer per field for the whole image
+            detections.append(Detections(boxes.xyxy.cpu().numpy(),
+                                         boxes.conf.cpu().numpy(),
+                                         boxes.cls.cpu().numpy().astype(np.int64)))
+        return detections
+
+class ExportedModelEngine(InferenceEngine):
+    """Shared letterbox pre-processing and YOLO post-processing for exported graphs"""
+    export_format = None
+    
+    def __init__(self, model_path, **options):
+        super().__init__(model_path, **options)
+        if str(model_path).endswith('.pt'):
+            model_path = export_cached(model_path, self.export_format, self.imgsz)
+        self.model_path = model_path
+    
+    def load_metadata(self, metadata):
+        """Apply ultralytics export metadata (class names, input size)"""
+        names = metadata.get('names')
+        if isinstance(names, str):
+            names = ast.literal_eval(names)
+        if isinstance(names, (list, tuple)):
+            names = dict(enumerate(names))
+        self.names = names or {}
+        
+        imgsz = metadata.get('imgsz')
+        if isinstance(imgsz, str):
+            imgsz = ast.literal_eval(imgsz)
+        if imgsz:
+            self.imgsz = max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+    
+    def letterbox(self, frame):
+        """Resize keeping aspect ratio and pad to a square model input"""
+        height, width = frame.shape[:2]
+        ratio = min(self.imgsz / height, self.imgsz / width)
+        new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+        left = (self.imgsz - new_width) // 2
+        top = (self.imgsz - new_height) // 2
+        
+        canvas = np.full((self.imgsz, self.imgsz, 3), 114, dtype=np.uint8)
+        canvas[top:top + new_height, left:left + new_width] = cv2.resize(
+            frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        return canvas, ratio, (left, top)
+    
+    def preprocess(self, frames):
+        """Letterbox frames into one NCHW float32 RGB blob"""
+        canvases, transforms = [], []
+        for frame in frames:
+            canvas, ratio, pad = self.letterbox(frame)
+            canvases.append(canvas)
+            transforms.append((ratio, pad, frame.shape[:2]))
+        blob = cv2.dnn.blobFromImages(canvases, scalefactor=1 / 255.0, swapRB=True)
+        return blob, transforms
+    
+    def postprocess(self, output, transform):
+        """Decode one image's raw output into frame-space Detections"""
+        ratio, (left, top), (height, width) = transform
+        
+        if output.ndim == 2 and output.shape[1] == 6:
+            # End-to-end export, already NMS'd: [x1, y1, x2, y2, conf, cls]
+            output = output[output[:, 4] >= self.conf]
+            xyxy, conf, cls = output[:, :4], output[:, 4], output[:, 5].astype(np.int64)
+        else:
+            # Raw head: (4 + num_classes, anchors), boxes as cx, cy, w, h
+            channels_first = (output.shape[0] == 4 + len(self.names) if self.names
+                              else output.shape[0] < output.shape[1])
+            predictions = output.T if channels_first else output
+            scores = predictions[:, 4:]
+            cls = scores.argmax(axis=1)
+            conf = scores[np.arange(len(scores)), cls]
+            keep = conf >= self.conf
+            predictions, cls, conf = predictions[keep], cls[keep], conf[keep]
+            if len(conf) == 0:
+                return Detections()
+            
+            cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+            xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+            
+            keep = class_aware_nms(xyxy, conf, cls, self.iou)
+            xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep].astype(np.int64)
+        
+        # Undo letterbox back into original frame pixels
+        xyxy = (xyxy - np.array([left, top, left, top], dtype=np.float32)) / ratio
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        return Detections(xyxy.astype(np.float32), conf.astype(np.float32), cls)
+    
+    def predict_batch(self, frames):
+        blob, transforms = self.preprocess(frames)
+        if self.batch_size is not None and self.batch_size != len(frames):
+            # Static-batch graph: run images one at a time
+            outputs = np.concatenate([self.run(blob[i:i + 1]) for i in range(len(frames))])
+        else:
+            outputs = self.run(blob)
+        return [self.postprocess(output, transform) for output, transform in zip(outputs, transforms)]
+    
+    def run(self, blob):
+        """Execute the graph on an NCHW blob and return the first output"""
+        raise NotImplementedError
+
+class OnnxRuntimeEngine(ExportedModelEngine):
+    """ONNX Runtime CPU backend"""
+    name = 'onnxruntime'
+    export_format = 'onnx'
+    thread_safe = True
+    
+    def __init__(self, model_path, **options):
+        super().__init__(model_path, **options)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("onnxruntime backend requires: pip install onnxruntime") from e
+        
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        self.session = ort.InferenceSession(str(self.model_path), session_options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        
+        self.load_metadata(self.session.get_modelmeta().custom_metadata_map)
+        shape = self.session.get_inputs()[0].shape
+        self.batch_size = shape[0] if isinstance(shape[0], int) else None
+        if isinstance(shape[2], int):
+            self.imgsz = shape[2]
+    
+    def run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+class OpenVinoEngine(ExportedModelEngine):
+    """OpenVINO CPU backend"""
+    name = 'openvino'
+    export_format = 'openvino'
+    
+    def __init__(self, model_path, **options):
+        super().__init__(model_path, **options)
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise ImportError("openvino backend requires: pip install openvino") from e
+        
+        # Accept either the export directory or the .xml inside it
+        model_dir = self.model_path if os.path.isdir(self.model_path) else os.path.dirname(self.model_path)
+        xml_path = self.model_path
+        if os.path.isdir(self.model_path):
+            xml_path = next(os.path.join(model_dir, f) for f in sorted(os.listdir(model_dir)) if f.endswith('.xml'))
+        
+        metadata_path = os.path.join(model_dir, 'metadata.yaml')
+        if os.path.exists(metadata_path):
+            import yaml
+            with open(metadata_path) as f:
+                self.load_metadata(yaml.safe_load(f) or {})
+        
+        core = ov.Core()
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if self.threads:
+            config['INFERENCE_NUM_THREADS'] = self.threads
+        model = core.read_model(xml_path)
+        input_shape = model.inputs[0].get_partial_shape()
+        self.batch_size = input_shape[0].get_length() if input_shape[0].is_static else None
+        if input_shape[2].is_static:
+            self.imgsz = input_shape[2].get_length()
+        self.compiled = core.compile_model(model, 'CPU', config)
+        self.output = self.compiled.output(0)
+    
+    def run(self, blob):
+        return self.compiled([blob])[self.output]
+
+class TiledEngine(InferenceEngine):
+    """Runs another engine on overlapping tiles of each image and merges the detections"""
+    def __init__(self, engine, tile_size=640, overlap=0.2, batch_size=4, concurrency=1):
+        super().__init__(engine.model_path, engine.conf, engine.iou, engine.imgsz, engine.threads)
+        self.engine = engine
+        self.name = engine.name
+        self.names = engine.names
+        self.tile_size = tile_size
+        self.step = max(1, int(tile_size * (1 - overlap)))
+        self.batch_size = max(1, batch_size)
+        self.executor = None
+        if concurrency > 1 and engine.thread_safe:
+            self.executor = ThreadPoolExecutor(concurrency, thread_name_prefix="tile")
+    
+    def tile_starts(self, length):
+        """Tile offsets along one axis, the last one flush with the far edge"""
+        if length <= self.tile_size:
+            return [0]
+        return sorted(set(range(0, length - self.tile_size, self.step)) | {length - self.tile_size})
+    
+    def predict_batch(self, frames):
+        # Every tile of every frame in one list, so tiles from several frames batch together
+        jobs = []
+        for index, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            # The full-frame pass finds whatever the tile edges cut through
+            jobs.append((index, 0, 0, frame))
+            if height <= self.tile_size and width <= self.tile_size:
+                continue
+            for y in self.tile_starts(height):
+                for x in self.tile_starts(width):
+                    jobs.append((index, x, y, frame[y:y + self.tile_size, x:x + self.tile_size]))
+        
+        chunks = [jobs[i:i + self.batch_size] for i in range(0, len(jobs), self.batch_size)]
+        run = lambda chunk: self.engine.predict_batch([job[3] for job in chunk])
+        results = list(self.executor.map(run, chunks)) if self.executor else [run(chunk) for chunk in chunks]
+        
+        per_frame = [[] for _ in frames]
+        for chunk, chunk_results in zip(chunks, results):
+            for (index, x, y, image), boxes in zip(chunk, chunk_results):
+                per_frame[index].append(self.to_frame(boxes, x, y, image.shape[:2], frames[index].shape[:2]))
+        # Cross-tile NMS over each frame's tile and full-frame detections
+        return [merge_detections(parts, self.iou) for parts in per_frame]
+    
+    def to_frame(self, boxes, x, y, tile_shape, frame_shape, margin=2):
+        """Shift tile detections into frame pixels, dropping boxes cut off by an inner tile edge"""
+        if len(boxes) == 0 or tile_shape == frame_shape:
+            return boxes
+        tile_height, tile_width = tile_shape
+        height, width = frame_shape
+        xyxy = boxes.xyxy
+        # The full-frame pass (or a neighbouring tile) sees those objects whole
+        cut = np.zeros(len(boxes), dtype=bool)
+        if x > 0:
+            cut |= xyxy[:, 0] <= margin
+        if y > 0:
+            cut |= xyxy[:, 1] <= margin
+        if x + tile_width < width:
+            cut |= xyxy[:, 2] >= tile_width - margin
+        if y + tile_height < height:
+            cut |= xyxy[:, 3] >= tile_height - margin
+        keep = ~cut
+        offset = np.array([x, y, x, y], dtype=np.float32)
+        return Detections(xyxy[keep] + offset, boxes.conf[keep], boxes.cls[keep])
+
+class CascadeEngine(InferenceEngine):
+    """Screens frames with a fast low-resolution engine, re-inspecting suspects at full resolution"""
+    def __init__(self, screen, verify, crop_margin=1.0, min_crop=160):
+        super().__init__(verify.model_path, verify.conf, verify.iou, verify.imgsz, verify.threads)
+        self.screen = screen
+        self.verify = verify
+        self.name = verify.name
+        self.names = verify.names
+        self.thread_safe = screen.thread_safe and verify.thread_safe
+        self.crop_margin = crop_margin
+        self.min_crop = min_crop
+        self.defect_lut = build_defect_lut(verify.names)[1]
+        # Escalation counters, logged periodically
+        self.stats_lock = threading.Lock()
+        self.frames = 0
+        self.crops = 0
+        self.rerun = 0
+        self.verified = 0
+    
+    def crop_window(self, box, frame_shape):
+        """Square window around a suspect box, clipped to the frame: (x1, y1, x2, y2)"""
+        height, width = frame_shape
+        x1, y1, x2, y2 = box
+        size = max(x2 - x1, y2 - y1) * (1 + 2 * self.crop_margin)
+        half = max(size, self.min_crop) / 2
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        return (int(max(0, cx - half)), int(max(0, cy - half)),
+                int(min(width, np.ceil(cx + half))), int(min(height, np.ceil(cy + half))))
+    
+    def predict_batch(self, frames):
+        screened = self.screen.predict_batch(frames)
+        
+        # Stage one settles confident frames except for their defect boxes; uncertain
+        # frames are re-run whole and every suspected defect gets a crop
+        results = [None] * len(frames)
+        rerun, crops = [], []
+        for index, (frame, boxes) in enumerate(zip(frames, screened)):
+            if len(boxes) and boxes.conf.max() < self.conf:
+                rerun.append(index)
+                continue
+            suspect = lookup_defects(self.defect_lut, boxes.cls)
+            keep = ~suspect & (boxes.conf >= self.conf)
+            results[index] = Detections(boxes.xyxy[keep], boxes.conf[keep], boxes.cls[keep])
+            crops.extend((index, self.crop_window(box, frame.shape[:2])) for box in boxes.xyxy[suspect])
+        
+        # One call for both kinds of re-inspection so they batch together
+        jobs = [frames[index] for index in rerun]
+        jobs += [frames[index][y1:y2, x1:x2] for index, (x1, y1, x2, y2) in crops]
+        verified = self.verify.predict_batch(jobs) if jobs else []
+        for index, boxes in zip(rerun, verified):
+            results[index] = boxes
+        
+        per_frame = {}
+        for (index, (x1, y1, _, _)), boxes in zip(crops, verified[len(rerun):]):
+            confirmed = lookup_defects(self.defect_lut, boxes.cls)
+            offset = np.array([x1, y1, x1, y1], dtype=np.float32)
+            per_frame.setdefault(index, [results[index]]).append(
+                Detections(boxes.xyxy[confirmed] + offset, boxes.conf[confirmed], boxes.cls[confirmed]))
+        # Overlapping crops find the same defect more than once
+        for index, parts in per_frame.items():
+            results[index] = merge_detections(parts, self.iou)
+        
+        with self.stats_lock:
+            self.frames += len(frames)
+            self.crops += len(crops)
+            self.rerun += len(rerun)
+            self.verified += len(per_frame) + len(rerun)
+            logger.info('cascade_stats', frames=self.frames, crops=self.crops, rerun=self.rerun,
+                        verified_ratio=round(self.verified / self.frames, 3), rate_limit=60.0)
+        return results
+    
+    def warmup(self, frame_size, runs=1, batch_size=1):
+        # Dummy frames never escalate, so warm the verify engine on frames and crops directly
+        crop_size = (self.min_crop, self.min_crop)
+        return (self.screen.warmup(frame_size, runs, batch_size) +
+                self.verify.warmup(frame_size, runs) + self.verify.warmup(crop_size, runs))
+
+# Backend name -> engine class, selected by INFERENCE_CONFIG['backend']
+ENGINES = {engine.name: engine for engine in (TorchEngine, OnnxRuntimeEngine, OpenVinoEngine)}
+
+def detect_backend(model_path):
+    """Pick a backend from the model artifact type"""
+    path = str(model_path).rstrip('/\\')
+    if path.endswith('.onnx'):
+        return 'onnxruntime'
+    if path.endswith('.xml') or path.endswith('_openvino_model'):
+        return 'openvino'
+    return 'torch'
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def export_cached(weights_path, export_format, imgsz):
+    """Exported artifact for PyTorch weights, converting with ultralytics only on a cache miss"""
+    cache_dir = MODEL_CACHE_CONFIG['dir']
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    suffix = '.onnx' if export_format == 'onnx' else f"_{export_format}_model"
+    cached_path = os.path.join(cache_dir, f"{stem}-{hash_file(weights_path)[:16]}-{imgsz}{suffix}")
+    if os.path.exists(cached_path):
+        logger.info('model_cache_hit', weights=weights_path, artifact=cached_path)
+        return cached_path
+    
+    from ultralytics import YOLO
+    
+    logger.info('model_export', weights=weights_path, format=export_format, imgsz=imgsz)
+    exported = YOLO(weights_path).export(format=export_format, imgsz=imgsz)
+    
+    # Stage then rename, so a concurrent start never picks up a half-copied artifact
+    os.makedirs(cache_dir, exist_ok=True)
+    staging_path = f"{cached_path}.{os.getpid()}.tmp"
+    shutil.move(str(exported), staging_path)
+    try:
+        os.replace(staging_path, cached_path)
+    except OSError:
+        # Another process cached the same artifact first
+        shutil.rmtree(staging_path, ignore_errors=True)
+    logger.info('model_cached', artifact=cached_path)
+    return cached_path
+
+def create_engine(model_path, backend=None, screen_path=None, **options):
+    """Build the configured inference engine; screen_path is the cascade's screening artifact"""
+    backend = backend or INFERENCE_CONFIG['backend'] or detect_backend(model_path)
+    if backend not in ENGINES:
+        raise ValueError(f"Unknown inference backend: {backend} (choose from {', '.join(ENGINES)})")
+    for key in ('conf', 'iou', 'imgsz', 'threads'):
+        options.setdefault(key, INFERENCE_CONFIG[key])
+    engine = ENGINES[backend](model_path, **options)
+    if TILING_CONFIG['enabled']:
+        engine = TiledEngine(engine, TILING_CONFIG['tile_size'], TILING_CONFIG['overlap'],
+                             TILING_CONFIG['batch_size'], TILING_CONFIG['concurrency'])
+    if CASCADE_CONFIG['enabled']:
+        # Same weights at the screening size: PyTorch resizes per call, exported graphs need
+        # their own artifact (see load_model), else a fixed-shape graph keeps its input size
+        screen = ENGINES[backend](screen_path or model_path,
+                                  **dict(options, imgsz=CASCADE_CONFIG['screen_imgsz'],
+                                         conf=CASCADE_CONFIG['screen_conf']))
+        if screen.imgsz < engine.imgsz:
+            engine = CascadeEngine(screen, engine, CASCADE_CONFIG['crop_margin'], CASCADE_CONFIG['min_crop'])
+        else:
+            # Screening at full size only adds the verification passes on top
+            logger.warning('cascade_disabled', model_path=screen_path or model_path,
+                           screen_imgsz=screen.imgsz, imgsz=engine.imgsz,
+                           error="screening model is not smaller than the full model")
+    return engine
+
+def collect_batch(get, max_batch, max_wait_ms):
+    """Block for one item, then take more until max_batch items or max_wait_ms elapsed"""
+    batch = [get(None)]
+    deadline = time.perf_counter() + max_wait_ms / 1000.0
+    while len(batch) < max_batch and batch[-1] is not None:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(get(remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def inference_worker(model_path, backend, options, tasks, results, max_batch=1, max_wait_ms=0):
+    """Worker process: run the engine on micro-batches of frames from the shared-memory ring"""
+    try:
+        engine = create_engine(model_path, backend=backend, **options)
+        warmup_ms = engine.warmup(WARMUP_CONFIG['frame_size'], WARMUP_CONFIG['runs'], max_batch)
+        logger.info('model_warmup', pid=os.getpid(), backend=engine.name, ms=round(warmup_ms, 1))
+    except Exception as e:
+        results.put(('failed', os.getpid(), str(e)))
+        return
+    results.put(('ready', os.getpid(), engine.name, engine.names))
+    
+    rings = {}
+    is_running = True
+    while is_running:
+        batch = collect_batch(lambda timeout: tasks.get(timeout=timeout), max_batch, max_wait_ms)
+        if batch[-1] is None:
+            # Shutdown sentinel, finish what was collected before it
+            is_running = False
+            batch.pop()
+        if not batch:
+            continue
+        
+        frames = []
+        for task_id, ring_name, offset, shape in batch:
+            if ring_name not in rings:
+                rings[ring_name] = shared_memory.SharedMemory(name=ring_name)
+            frames.append(np.ndarray(shape, dtype=np.uint8, buffer=rings[ring_name].buf, offset=offset))
+        try:
+            for task, boxes in zip(batch, engine.predict_batch(frames)):
+                results.put(('result', task[0], boxes.xyxy, boxes.conf, boxes.cls))
+        except Exception as e:
+            for task in batch:
+                results.put(('error', task[0], str(e)))
+        finally:
+            del frames
+    
+    for ring in rings.values():
+        ring.close()
+
+class MicroBatcher:
+    """Runs frames from one or more sources through an in-process engine in micro-batches"""
+    def __init__(self, engine, max_batch, max_wait_ms):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.pending = queue.Queue(maxsize=2 * max_batch)
+        self.lock = threading.Lock()
+        self.outputs = {}      # source -> BoundedQueue of results
+        
+        self.batches = 0
+        self.avg_batch_size = 0.0
+        self.avg_ms = 0.0
+        self.errors = 0
+        
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, name="micro-batcher", daemon=True)
+        self.thread.start()
+    
+    @property
+    def name(self):
+        return self.engine.name
+    
+    @property
+    def names(self):
+        return self.engine.names
+    
+    def output(self, source='default'):
+        """Result queue for one frame source"""
+        with self.lock:
+            if source not in self.outputs:
+                self.outputs[source] = BoundedQueue(2 * self.max_batch, 'drop-oldest')
+            return self.outputs[source]
+    
+    def reset(self, source='default'):
+        """Start a fresh result queue for a source, e.g. after a restart"""
+        with self.lock:
+            self.outputs[source] = BoundedQueue(2 * self.max_batch, 'drop-oldest')
+    
+    def attach(self, source, output):
+        """Deliver a source's results into an existing queue, e.g. after a model swap"""
+        with self.lock:
+            self.outputs[source] = output
+    
+    def submit(self, packet, timeout=1.0):
+        """Queue a frame for the next batch; blocks while the batcher is saturated"""
+        self.output(packet.get('source', 'default'))
+        try:
+            self.pending.put(packet, timeout=timeout)
+        except queue.Full:
+            pass
+        return None
+    
+    def run(self):
+        """Batch thread: collect up to max_batch frames or max_wait_ms, run them together"""
+        def get(timeout):
+            if timeout is None:
+                # Wake up periodically so close() is noticed
+                while self.is_running:
+                    try:
+                        return self.pending.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+                return None
+            return self.pending.get(timeout=timeout)
+        
+        while self.is_running:
+            batch = [packet for packet in collect_batch(get, self.max_batch, self.max_wait_ms) if packet is not None]
+            if not batch:
+                continue
+            
+            start_time = time.perf_counter()
+            try:
+                boxes = self.engine.predict_batch([packet['input'] for packet in batch])
+            except Exception as e:
+                self.errors += 1
+                logger.error('batch_inference_error', error=str(e), batch_size=len(batch), rate_limit=5.0)
+                continue
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            
+            self.batches += 1
+            self.avg_batch_size = 0.9 * self.avg_batch_size + 0.1 * len(batch) if self.batches > 1 else len(batch)
+            self.avg_ms = 0.9 * self.avg_ms + 0.1 * elapsed_ms if self.batches > 1 else elapsed_ms
+            
+            # Split results back to each frame's source, in arrival order
+            for packet, packet_boxes in zip(batch, boxes):
+                packet['boxes'] = packet_boxes
+                self.output(packet.get('source', 'default')).put(packet)
+    
+    def get_stats(self):
+        """Return batch size and timing"""
+        return {
+            'batches': self.batches,
+            'avg_batch_size': round(self.avg_batch_size, 2),
+            'avg_batch_ms': round(self.avg_ms, 1),
+            'errors': self.errors
+        }
+    
+    def close(self):
+        """Stop the batch thread"""
+        self.is_running = False
+
+class InferencePool:
+    """Inference worker processes fed through a shared-memory frame ring"""
+    def __init__(self, model_path, workers, backend=None, slots=None, max_batch=1, max_wait_ms=0,
+                 progress=None, **options):
+        self.workers = workers
+        # Enough slots for every worker to hold a full batch plus one being refilled
+        self.slot_count = slots or workers * (max_batch + 1)
+        
+        # Split CPU threads between workers so they don't oversubscribe the cores
+        options.setdefault('threads', INFERENCE_CONFIG['threads'] or max(1, (os.cpu_count() or 1) // workers))
+        
+        # The ring is sized from the first frame and grown if a larger frame arrives.
+        # Stations submit from their own threads, so sizing and slot writes are serialised
+        self.ring = None
+        self.slot_bytes = 0
+        self.free_slots = queue.Queue()
+        self.ring_lock = threading.Lock()
+        
+        self.lock = threading.Lock()
+        self.next_task_id = 0
+        self.in_flight = {}    # task_id -> (packet, slot)
+        self.order = {}        # source -> deque of task ids in submission order
+        self.completed = {}    # task_id -> packet with detections (or None on error)
+        self.outputs = {}      # source -> BoundedQueue of in-order results
+        self.errors = 0
+        self.is_running = True
+        
+        context = multiprocessing.get_context('spawn')
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.processes = [
+            context.Process(target=inference_worker, name=f"inference-{i}", daemon=True,
+                            args=(model_path, backend, options, self.tasks, self.results,
+                                  max_batch, max_wait_ms))
+            for i in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+        
+        # Wait until every worker has loaded the model
+        for ready in range(1, workers + 1):
+            try:
+                message = self.results.get(timeout=POOL_CONFIG['startup_timeout'])
+            except queue.Empty:
+                message = ('failed', None, 'timed out loading the model')
+            if message[0] == 'failed':
+                self.close()
+                raise RuntimeError(f"Inference worker failed to start: {message[2]}")
+            _, pid, self.name, self.names = message
+            logger.info('inference_worker_ready', pid=pid, backend=self.name)
+            if progress is not None:
+                progress(ready, workers)
+        
+        self.collector = threading.Thread(target=self.collect_results, name="inference-collector", daemon=True)
+        self.collector.start()
+    
+    def allocate_ring(self, frame_bytes):
+        """(Re)create the shared-memory ring with room for slot_count frames; call with ring_lock held"""
+        if self.ring is not None:
+            # Let in-flight frames finish before the old ring goes away
+            for _ in range(self.slot_count):
+                self.free_slots.get()
+            self.ring.close()
+            self.ring.unlink()
+        
+        self.slot_bytes = frame_bytes
+        self.ring = shared_memory.SharedMemory(create=True, size=frame_bytes * self.slot_count)
+        self.free_slots = queue.Queue()
+        for slot in range(self.slot_count):
+            self.free_slots.put(slot)
+        logger.info('inference_ring_allocated', slots=self.slot_count, slot_mb=round(frame_bytes / 1e6, 1))
+    
+    def output(self, source='default'):
+        """In-order result queue for one frame source"""
+        with self.lock:
+            if source not in self.outputs:
+                self.outputs[source] = BoundedQueue(self.slot_count, 'drop-oldest')
+                self.order[source] = deque()
+            return self.outputs[source]
+    
+    def submit(self, packet, timeout=1.0):
+        """Copy the frame into a free ring slot and queue it for a worker"""
+        frame = np.ascontiguousarray(packet['input'])
+        source = packet.get('source', 'default')
+        self.output(source)
+        with self.ring_lock:
+            if self.ring is None or frame.nbytes > self.slot_bytes:
+                self.allocate_ring(frame.nbytes)
+            
+            # Blocks while every slot is busy, so capture drops frames instead of queueing them
+            try:
+                slot = self.free_slots.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            offset = slot * self.slot_bytes
+            target = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.ring.buf, offset=offset)
+            target[:] = frame
+            del target
+            
+            with self.lock:
+                task_id = self.next_task_id
+                self.next_task_id += 1
+                self.in_flight[task_id] = (packet, slot)
+                self.order[source].append(task_id)
+            self.tasks.put((task_id, self.ring.name, offset, frame.shape))
+        return None
+    
+    def collect_results(self):
+        """Collector thread: free slots and release results in submission order per source"""
+        while self.is_running:
+            try:
+                message = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            
+            kind, task_id = message[0], message[1]
+            with self.lock:
+                entry = self.in_flight.pop(task_id, None)
+            if entry is None:
+                continue
+            packet, slot = entry
+            self.free_slots.put(slot)
+            source = packet.get('source', 'default')
+            
+            if kind == 'result':
+                packet['boxes'] = Detections(*message[2:5])
+            else:
+                self.errors += 1
+                logger.error('inference_worker_error', error=message[2], rate_limit=5.0)
+                packet = None
+            self.release(source, task_id, packet)
+    
+    def release(self, source, task_id, packet):
+        """Store a finished task and emit every result that is now in order"""
+        with self.lock:
+            order = self.order[source]
+            if task_id not in order:
+                # Submitted before a reset, nobody is waiting for it any more
+                return
+            self.completed[task_id] = packet
+            ready = []
+            while order and order[0] in self.completed:
+                ready.append(self.completed.pop(order.popleft()))
+            output = self.outputs[source]
+        for packet in ready:
+            if packet is not None:
+                output.put(packet)
+    
+    def reset(self, source='default'):
+        """Forget results still pending for a source, e.g. after a restart"""
+        with self.lock:
+            order = self.order.get(source)
+            if order:
+                for task_id in order:
+                    self.completed.pop(task_id, None)
+                order.clear()
+            if source in self.outputs:
+                self.outputs[source] = BoundedQueue(self.slot_count, 'drop-oldest')
+    
+    def attach(self, source, output):
+        """Deliver a source's results into an existing queue, e.g. after a model swap"""
+        with self.lock:
+            self.outputs[source] = output
+            self.order.setdefault(source, deque())
+    
+    def get_stats(self):
+        """Return worker and ring utilisation"""
+        return {
+            'workers': sum(process.is_alive() for process in self.processes),
+            'slots_busy': len(self.in_flight),
+            'slots': self.slot_count,
+            'errors': self.errors
+        }
+    
+    def close(self):
+        """Stop workers and release the shared-memory ring"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        with self.ring_lock:
+            if self.ring is not None:
+                self.ring.close()
+                self.ring.unlink()
+                self.ring = None
+
+def normalize_rois(rois):
+    """Validate ROIs into [[x1, y1, x2, y2], ...] integer lists"""
+    normalized = []
+    for roi in rois:
+        x1, y1, x2, y2 = (int(round(float(v))) for v in roi)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"Empty region of interest: {list(roi)}")
+        normalized.append([x1, y1, x2, y2])
+    
+    # Each ROI is inferred on its own, so an object in an overlap would be found and counted twice
+    boxes = np.array(normalized, dtype=np.float32).reshape(-1, 4)
+    overlap = np.triu(box_intersection(boxes, boxes) > 0, k=1)
+    if overlap.any():
+        first, second = np.argwhere(overlap)[0]
+        raise ValueError(f"Regions of interest overlap: {normalized[first]} and {normalized[second]}")
+    return normalized
+
+def load_saved_rois():
+    """Dashboard-drawn ROIs by station name"""
+    try:
+        with open(ROI_CONFIG['path']) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning('rois_load_failed', path=ROI_CONFIG['path'], error=str(e))
+        return {}
+
+def save_rois(stations):
+    """Persist every station's ROIs, replacing the file in one step"""
+    staging_path = f"{ROI_CONFIG['path']}.tmp"
+    with open(staging_path, 'w') as f:
+        json.dump({name: station.rois for name, station in stations.items()}, f, indent=2)
+    os.replace(staging_path, ROI_CONFIG['path'])
+
+def build_roi_mosaic(frame, rois):
+    """Crop ROIs and tile them into one model input; returns (image, layout) or (frame, None)"""
+    height, width = frame.shape[:2]
+    rois = [(x1, y1, min(x2, width), min(y2, height)) for x1, y1, x2, y2 in rois
+            if x1 < width and y1 < height]
+    if not rois:
+        return frame, None
+    crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in rois]
+    if len(crops) == 1:
+        x1, y1, x2, y2 = rois[0]
+        return np.ascontiguousarray(crops[0]), [(0, 0, x2 - x1, y2 - y1, x1, y1)]
+    
+    # Tile along whichever axis keeps the mosaic closer to square, like the model input
+    widths = [crop.shape[1] for crop in crops]
+    heights = [crop.shape[0] for crop in crops]
+    horizontal = abs(np.log(sum(widths) / max(heights))) <= abs(np.log(max(widths) / sum(heights)))
+    size = (max(heights), sum(widths)) if horizontal else (sum(heights), max(widths))
+    mosaic = np.full(size + (3,), 114, dtype=np.uint8)
+    
+    # layout entries: tile rectangle in the mosaic and its translation back to the frame
+    layout = []
+    offset = 0
+    for crop, (x1, y1, _, _) in zip(crops, rois):
+        tile_height, tile_width = crop.shape[:2]
+        left, top = (offset, 0) if horizontal else (0, offset)
+        mosaic[top:top + tile_height, left:left + tile_width] = crop
+        layout.append((left, top, left + tile_width, top + tile_height, x1 - left, y1 - top))
+        offset += tile_width if horizontal else tile_height
+    return mosaic, layout
+
+def map_roi_boxes(boxes, layout):
+    """Translate detections on an ROI mosaic back into frame pixels"""
+    if len(boxes) == 0:
+        return boxes
+    xyxy = boxes.xyxy.astype(np.float32, copy=True)
+    centre_x = (xyxy[:, 0] + xyxy[:, 2]) / 2
+    centre_y = (xyxy[:, 1] + xyxy[:, 3]) / 2
+    
+    # A box belongs to the tile holding its centre and is clipped to that tile
+    keep = np.zeros(len(xyxy), dtype=bool)
+    for left, top, right, bottom, dx, dy in layout:
+        rows = np.flatnonzero((centre_x >= left) & (centre_x < right) &
+                              (centre_y >= top) & (centre_y < bottom))
+        xyxy[rows] = np.clip(xyxy[rows], [left, top, left, top], [right, bottom, right, bottom]) + [dx, dy, dx, dy]
+        keep[rows] = True
+    return Detections(xyxy[keep], boxes.conf[keep], boxes.cls[keep])
+
+def box_intersection(a, b):
+    """Pairwise intersection area between (N, 4) and (M, 4) xyxy boxes"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    return np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+    intersection = box_intersection(a, b)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-6)
+
+class MotionGate:
+    """Cheap change detector deciding whether a frame needs inference"""
+    def __init__(self, size=(80, 45), pixel_threshold=12, area_threshold=0.005, max_skip=15):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.area_threshold = area_threshold
+        self.max_skip = max_skip
+        self.reference = None
+        self.skipped_in_row = 0
+        
+        self.checked = 0
+        self.skipped = 0
+        self.window_checked = 0
+        self.window_skipped = 0
+        self.avg_ms = 0.0
+    
+    def check(self, frame, force=False):
+        """True if the frame changed enough since the last inferred frame to need inference"""
+        start_time = time.perf_counter()
+        small = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        changed = (force or self.reference is None or self.skipped_in_row >= self.max_skip or
+                   np.count_nonzero(cv2.absdiff(small, self.reference) > self.pixel_threshold)
+                   > self.area_threshold * small.size)
+        if changed:
+            # Compare against the last inferred frame, so slow drift still adds up
+            self.reference = small
+            self.skipped_in_row = 0
+        else:
+            self.skipped_in_row += 1
+            self.skipped += 1
+            self.window_skipped += 1
+        self.checked += 1
+        self.window_checked += 1
+        
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        self.avg_ms = 0.9 * self.avg_ms + 0.1 * elapsed_ms if self.checked > 1 else elapsed_ms
+        return changed
+    
+    def get_stats(self):
+        """Skip counters; skip_ratio covers the frames since the previous call"""
+        skip_ratio = self.window_skipped / self.window_checked if self.window_checked else 0.0
+        self.window_checked = self.window_skipped = 0
+        return {'name': 'gate', 'avg_ms': round(self.avg_ms, 2), 'processed': self.checked,
+                'dropped': 0, 'queued': 0, 'errors': 0,
+                'skipped': self.skipped, 'skip_ratio': round(skip_ratio, 3)}
+
+class PartTracker:
+    """SORT-style IoU tracker: a stable id per part and one verdict when it leaves the view"""
+    def __init__(self, iou_threshold=0.3, max_age=15, min_hits=3, defect_min_frames=1):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.defect_min_frames = defect_min_frames
+        self.tracks = {}    # id -> {'box', 'velocity', 'hits', 'misses', 'defect_frames', 'part'}
+        self.next_id = 1
+    
+    def update(self, xyxy, is_defect):
+        """Feed one frame's boxes; returns a track id per box (None for defects on a part) and finished parts"""
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        part_index = np.flatnonzero(~is_defect)
+        defect_index = np.flatnonzero(is_defect)
+        parts = xyxy[part_index]
+        
+        # Each defect counts against the detected part it overlaps most
+        overlap = box_intersection(xyxy[defect_index], parts)
+        attached = overlap.max(axis=1, initial=0) > 0
+        has_defect = np.zeros(len(parts), dtype=bool)
+        if attached.any():
+            has_defect[overlap[attached].argmax(axis=1)] = True
+        
+        track_ids = list(self.tracks)
+        predicted = np.array([self.tracks[i]['box'] + self.tracks[i]['velocity'] for i in track_ids],
+                             dtype=np.float32).reshape(-1, 4)
+        matches = self.match(track_ids, predicted, parts)
+        
+        # A defect on no detected part belongs to a part track it overlaps (the part was
+        # missed this frame), otherwise it is tracked as an NG part of its own, so NGs
+        # still count when the part box is missed or the model has no part class
+        loose = defect_index[~attached]
+        loose_ids = [None] * len(loose)
+        coasting = [i for i, track_id in enumerate(track_ids)
+                    if track_id not in matches and self.tracks[track_id]['part']]
+        if len(loose) and coasting:
+            for k, row in enumerate(box_intersection(xyxy[loose], predicted[coasting])):
+                if row.max() > 0:
+                    loose_ids[k] = track_ids[coasting[row.argmax()]]
+        for track_id in set(loose_ids) - {None}:
+            self.tracks[track_id]['defect_frames'] += 1
+        
+        # Remaining loose defects continue or start defect-only tracks
+        rest = loose[[k for k, track_id in enumerate(loose_ids) if track_id is None]]
+        others = [i for i, track_id in enumerate(track_ids)
+                  if track_id not in matches and not self.tracks[track_id]['part']]
+        matches.update(self.match([track_ids[i] for i in others], predicted[others], xyxy[rest], len(parts)))
+        objects = np.concatenate([parts, xyxy[rest]])
+        object_index = np.concatenate([part_index, rest])
+        has_defect = np.concatenate([has_defect, np.ones(len(rest), dtype=bool)])
+        
+        object_ids = [None] * len(objects)
+        for track_id, index in matches.items():
+            track = self.tracks[track_id]
+            motion = objects[index] - track['box']
+            track['velocity'] = motion if track['hits'] == 1 else 0.5 * track['velocity'] + 0.5 * motion
+            track['box'] = objects[index]
+            track['hits'] += 1
+            track['misses'] = 0
+            track['defect_frames'] += int(has_defect[index])
+            object_ids[index] = track_id
+        for index in range(len(objects)):
+            if object_ids[index] is None:
+                object_ids[index] = self.next_id
+                self.tracks[self.next_id] = {'box': objects[index], 'velocity': np.zeros(4, dtype=np.float32),
+                                             'hits': 1, 'misses': 0, 'defect_frames': int(has_defect[index]),
+                                             'part': index < len(parts)}
+                self.next_id += 1
+        
+        # A defect seen before its part (entering the view) started a defect-only track;
+        # once the part shows up around it, that track is the same part
+        for index in range(len(parts)):
+            track = self.tracks[object_ids[index]]
+            for track_id in track_ids:
+                other = self.tracks.get(track_id)
+                if (other is None or other['part'] or track_id in matches or
+                        not box_intersection(other['box'][None], parts[index][None])[0, 0] > 0):
+                    continue
+                track['hits'] += other['hits']
+                track['defect_frames'] += other['defect_frames']
+                del self.tracks[track_id]
+        
+        # Unseen tracks coast along their last motion until they age out
+        finished = []
+        for track_id in track_ids:
+            if track_id in matches or track_id not in self.tracks:
+                continue
+            track = self.tracks[track_id]
+            track['misses'] += 1
+            track['box'] = track['box'] + track['velocity']
+            if track['misses'] > self.max_age:
+                finished.extend(self.finish(track_id))
+        
+        box_ids = [None] * len(xyxy)
+        for index, track_id in zip(object_index, object_ids):
+            box_ids[index] = track_id
+        for index, track_id in zip(loose, loose_ids):
+            if track_id is not None:
+                box_ids[index] = track_id
+        return box_ids, finished
+    
+    def match(self, track_ids, predicted, boxes, offset=0):
+        """Greedy IoU matching of boxes to where each track is predicted to be now: {track_id: offset + box}"""
+        matches = {}
+        if not len(track_ids) or not len(boxes):
+            return matches
+        iou = box_iou(predicted, boxes)
+        for flat in np.argsort(-iou, axis=None):
+            track, box = np.unravel_index(flat, iou.shape)
+            if iou[track, box] < self.iou_threshold:
+                break
+            if track_ids[track] in matches or offset + box in matches.values():
+                continue
+            matches[track_ids[track]] = offset + box
+        return matches
+    
+    def finish(self, track_id):
+        """Retire a track; a part seen often enough yields its aggregated verdict"""
+        track = self.tracks.pop(track_id)
+        if track['hits'] < self.min_hits:
+            return []
+        return [{
+            'part_id': track_id,
+            'status': 'NG' if track['defect_frames'] >= self.defect_min_frames else 'PASS',
+            'frames': track['hits'],
+            'defect_frames': track['defect_frames']
+        }]
+    
+    def flush(self):
+        """Retire every live track, e.g. when detection stops"""
+        finished = []
+        for track_id in list(self.tracks):
+            finished.extend(self.finish(track_id))
+        return finished
+
+class Station:
+    """One camera station: its capture, pipeline, verdict, statistics and video stream"""
+    def __init__(self, name, detector, camera_index=0, rois=None):
+        self.name = name
+        self.room = f"station:{name}"
+        self.detector = detector
+        self.camera_index = camera_index
         self.camera = None
+        self.grabber = None
+        self.stages = []
         self.is_running = False
         self.current_frame = None
-        
-        # Print available class names for debugging
-        print("Available model classes:")
-        for i, class_name in enumerate(self.model.names.values()):
-            print(f"  {i}: {class_name}")
+        self.status_sprites = {}
+        self.results = None
+        self.last_seq = -1
+        self.last_inferred_seq = -1
+        self.tracker = PartTracker(**TRACKER_CONFIG)
+        self.gate = None
+        self.last_result = None    # (model, boxes, rois) of the newest inferred frame, reused by the gate
+        self.rois = normalize_rois(rois or [])
+        self.broadcaster = FrameBroadcaster(socketio)
+        # Video members live in the broadcaster; the other channels are Socket.IO rooms
+        self.subscribers = {'stats': set(), 'detections': set()}
         
         self.detection_results = {
             'has_defects': False,
             'detections': [],
             'fps': 0,
             'stats': {'total': 0, 'pass': 0, 'ng': 0},
-            'status': 'PASS'  # PASS, NG
+            'status': 'PASS',  # PASS, NG
+            'frame_age_ms': 0,
+            'dropped_frames': 0,
+            'pipeline': [],
+            'viewers': [],
+            'dispatcher': None
         }
         self.fps_counter = 0
         self.fps_start_time = time.time()
         
-    def initialize_camera(self, camera_index=0):
+    def channel_room(self, channel):
+        """Socket.IO room carrying one of this station's channels"""
+        return f"{self.room}:{channel}"
+    
+    def subscribe(self, sid, channel):
+        """Add a client to a channel"""
+        if channel == 'video':
+            self.broadcaster.add_client(sid)
+        else:
+            self.subscribers[channel].add(sid)
+    
+    def unsubscribe(self, sid, channel):
+        """Remove a client from a channel"""
+        if channel == 'video':
+            self.broadcaster.remove_client(sid)
+        else:
+            self.subscribers[channel].discard(sid)
+    
+    def get_channels(self, sid):
+        """Channels a client is subscribed to"""
+        return [channel for channel in CHANNELS if self.has_subscribers(channel, sid)]
+    
+    def has_subscribers(self, channel, sid=None):
+        """Whether a channel has any members (or the given member)"""
+        members = self.broadcaster.clients if channel == 'video' else self.subscribers[channel]
+        return sid in members if sid is not None else bool(members)
+    
+    def initialize_camera(self):
         """Initialize camera"""
+        camera_index = self.camera_index
         try:
             self.camera = cv2.VideoCapture(camera_index)
             self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
             self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
             self.camera.set(cv2.CAP_PROP_FPS, 30)
-            return True
+            # Keep the driver queue short so grabbed frames are as fresh as possible
+            self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            return self.camera.isOpened()
         except Exception as e:
-            print(f"Error initializing camera: {e}")
+            logger.error('camera_init_failed', station=self.name, camera_index=camera_index, error=str(e))
             return False
     
-    def process_detections(self, results, frame):
-        """Process YOLO detection results"""
-        defects_detected = False
-        detections = []
-        
-        if results and len(results) > 0 and results[0].boxes is not None:
-            boxes = results[0].boxes
+    def draw_detections(self, frame, detections):
+        """Draw bounding boxes and labels on frame"""
+        for detection in detections:
+            x1, y1, x2, y2 = [int(v) for v in detection['bbox']]
             
-            # Debug: Print all detected classes
-            print(f"Total detections: {len(boxes)}")
+            # Color coding based on object type
+            if detection['is_defect']:
+                color = (0, 0, 255)  # Red for SG-defect
+                status = "SG-DEFECT"
+            else:
+                color = (0, 255, 0)  # Green for other objects
+                status = detection['class'].upper()
             
-            for i, box in enumerate(boxes):
-                bbox = box.xyxy[0].cpu().numpy()
-                confidence = float(box.conf[0].cpu().numpy())
-                class_id = int(box.cls[0].cpu().numpy())
-                
-                class_name = self.model.names[class_id] if class_id < len(self.model.names) else f"Class_{class_id}"
-                
-                # Debug: Print detection info
-                print(f"Detection {i}: Class='{class_name}', Confidence={confidence:.2f}")
-                
-                detection_info = {
-                    'class': class_name,
-                    'confidence': confidence,
-                    'bbox': bbox.tolist()
-                }
-                detections.append(detection_info)
-                
-                # Check for defects (SG-defect objects)
-                defect_classes = ['sg-defect', 'sg_defect', 'sgdefect', 'sg defect', 'defect']
-                is_defect = (class_name.lower() in defect_classes or 
-                            'defect' in class_name.lower() or
-                            'sg' in class_name.lower())
-                
-                if is_defect:
-                    defects_detected = True
-                    print(f"SG-DEFECT DETECTED: {class_name}")
-                
-                x1, y1, x2, y2 = bbox.astype(int)
-                
-                # Color coding based on object type
-                if is_defect:
-                    color = (0, 0, 255)  # Red for SG-defect
-                    status = "SG-DEFECT"
-                else:
-                    color = (0, 255, 0)  # Green for other objects
-                    status = class_name.upper()
-                
-                # Draw bounding box
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                label = f"{status} {confidence:.2f}"
-                label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), 
-                            (x1 + label_size[0], y1), color, -1)
-                cv2.putText(frame, label, (x1, y1 - 5), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        return defects_detected, detections, frame
+            # Draw bounding box
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            label = f"{status} {detection['confidence']:.2f}"
+            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+            cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), 
+                        (x1 + label_size[0], y1), color, -1)
+            cv2.putText(frame, label, (x1, y1 - 5), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        return frame
+    
+    def get_status_sprite(self, current_status):
+        """Pre-rendered status text and its mask, cached per status"""
+        sprite = self.status_sprites.get(current_status)
+        if sprite is not None:
+            return sprite
+        
+        # Status display logic
+        if current_status == "PASS":
+            status_color = (0, 255, 0)  # Green
+            status_text_main = "PASS"
+            status_text_detail = "No SG-defects detected"
+        elif current_status == "NG":
+            status_color = (0, 0, 255)  # Red
+            status_text_main = "NG"
+            status_text_detail = "SG-defect detected!"
+        
+        # Text positions are relative to the banner's top-left corner. The text is
+        # rendered once in color (over black) and once as a coverage mask, so
+        # anti-aliased edges blend correctly with the live frame
+        x1, y1, x2, y2 = STATUS_BANNER
+        size = (y2 - y1 + 1, x2 - x1 + 1)
+        text = np.zeros(size + (3,), dtype=np.uint8)
+        coverage = np.zeros(size, dtype=np.uint8)
+        for canvas, main_color, detail_color in ((text, status_color, (255, 255, 255)),
+                                                 (coverage, 255, 255)):
+            cv2.putText(canvas, f"Status: {status_text_main}", (10 - x1, 50 - y1), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, main_color, 2)
+            cv2.putText(canvas, status_text_detail, (10 - x1, 70 - y1), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, detail_color, 1)
+        
+        # Per frame: banner = banner * scale + offset, which darkens the banner to
+        # 30% (same as a 70% black overlay) and pastes the text in one pass
+        alpha = coverage.astype(np.float32)[..., None] / 255.0
+        scale = 0.3 * (1.0 - alpha)
+        offset = text.astype(np.float32)
+        sprite = (scale, offset)
+        self.status_sprites[current_status] = sprite
+        return sprite
+    
+    def draw_status(self, frame, current_status, fps):
+        """Draw FPS and PASS/NG status panel on frame"""
+        x1, y1, x2, y2 = STATUS_BANNER
+        banner = frame[y1:y2 + 1, x1:x2 + 1]
+        if banner.size == 0:
+            return frame
+        
+        # Darken the banner region only and paste the cached status text
+        scale, offset = self.get_status_sprite(current_status)
+        height, width = banner.shape[:2]
+        blended = banner * scale[:height, :width] + offset[:height, :width]
+        np.clip(blended, 0, 255, out=blended)
+        banner[:] = blended.astype(np.uint8)
+        
+        # Display FPS, the only text that changes between frames
+        cv2.putText(banner, f"FPS: {fps}", (10 - x1, 25 - y1), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        return frame
     
     def determine_status(self, defects_detected):
         """Determine system status based on detection logic"""
@@ -113,20 +1817,18 @@ class YOLODetectionSystem:
         else:
             return "PASS"
     
-    def update_statistics(self, status):
-        """Update production statistics"""
-        current_time = time.time()
-        if not hasattr(self, 'last_detection_time'):
-            self.last_detection_time = 0
-        
-        # Count every 3 seconds to avoid rapid counting
-        if current_time - self.last_detection_time > 3.0:
-            self.detection_results['stats']['total'] += 1
-            if status == 'NG':
-                self.detection_results['stats']['ng'] += 1
-            elif status == 'PASS':
-                self.detection_results['stats']['pass'] += 1
-            self.last_detection_time = current_time
+    def update_statistics(self, parts):
+        """Update production statistics, once per finished part"""
+        stats = self.detection_results['stats']
+        for part in parts:
+            stats['total'] += 1
+            if part['status'] == 'NG':
+                stats['ng'] += 1
+            else:
+                stats['pass'] += 1
+            logger.info('part_counted', station=self.name, **part)
+            if self.has_subscribers('stats'):
+                socketio.emit('part_counted', dict(part, station=self.name), to=self.channel_room('stats'))
     
     def calculate_fps(self):
         """Calculate FPS"""
@@ -136,95 +1838,247 @@ class YOLODetectionSystem:
             self.detection_results['fps'] = self.fps_counter
             self.fps_counter = 0
             self.fps_start_time = current_time
+            self.detection_results['pipeline'] = self.get_pipeline_stats()
+            self.detection_results['viewers'] = self.broadcaster.get_stats()
+            if self.detector.model.dispatcher is not None:
+                self.detection_results['dispatcher'] = self.detector.model.dispatcher.get_stats()
     
-    def generate_frames(self):
-        """Generate video frames with detections"""
-        while self.is_running and self.camera is not None:
-            ret, frame = self.camera.read()
-            if not ret:
-                break
-            
-            try:
-                results = self.model(frame, conf=0.5)
-                defects_detected, detections, processed_frame = self.process_detections(results, frame)
-                
-                # Determine status based on detection logic
-                current_status = self.determine_status(defects_detected)
-                
-                self.detection_results['has_defects'] = defects_detected
-                self.detection_results['detections'] = detections
-                self.detection_results['status'] = current_status
-                
-                self.update_statistics(current_status)
-                self.calculate_fps()
-                
-                # Status display logic
-                if current_status == "PASS":
-                    status_color = (0, 255, 0)  # Green
-                    status_text_main = "PASS"
-                    status_text_detail = "No SG-defects detected"
-                elif current_status == "NG":
-                    status_color = (0, 0, 255)  # Red
-                    status_text_main = "NG"
-                    status_text_detail = "SG-defect detected!"
-                
-                # Display status on frame
-                fps_text = f"FPS: {self.detection_results['fps']}"
-                
-                # Create overlay for status display
-                overlay = processed_frame.copy()
-                cv2.rectangle(overlay, (5, 5), (650, 80), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.7, processed_frame, 0.3, 0, processed_frame)
-                
-                # Display FPS
-                cv2.putText(processed_frame, fps_text, (10, 25), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                # Display main status
-                cv2.putText(processed_frame, f"Status: {status_text_main}", (10, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-                
-                # Display detail
-                cv2.putText(processed_frame, status_text_detail, (10, 70), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                
-                self.current_frame = processed_frame.copy()
-                
-                # Encode frame to base64 for Socket.IO
-                ret, buffer = cv2.imencode('.jpg', self.current_frame, 
-                                        [cv2.IMWRITE_JPEG_QUALITY, 85])
-                if ret:
-                    frame_bytes = base64.b64encode(buffer).decode('utf-8')
-                    
-                    # Emit detection results and frame
-                    socketio.emit('detection_result', {
-                        'status': current_status,
-                        'defects_detected': defects_detected,
-                        'pass_count': self.detection_results['stats']['pass'],
-                        'ng_count': self.detection_results['stats']['ng'],
-                        'total_count': self.detection_results['stats']['total'],
-                        'ng_rate': round((self.detection_results['stats']['ng'] / 
-                                       max(1, self.detection_results['stats']['total']) * 100), 1)
-                    })
-                    socketio.emit('video_frame', {'frame': frame_bytes})
-            
-            except Exception as e:
-                print(f"Detection error: {e}")
-                self.current_frame = frame.copy()
-            
-            time.sleep(0.033)  # ~30 FPS
+    def get_pipeline_stats(self):
+        """Collect per-stage timing and drop counters"""
+        stats = []
+        if self.grabber is not None:
+            stats.append({'name': 'capture', 'avg_ms': 0, 'processed': self.grabber.seq,
+                          'dropped': self.grabber.dropped, 'queued': 0, 'errors': 0})
+        if self.gate is not None:
+            stats.append(self.gate.get_stats())
+        stats.extend(stage.get_stats() for stage in self.stages)
+        return stats
+    
+    def run_inference(self, packet):
+        """Infer stage: run the model in this thread, then apply the verdict"""
+        if self.needs_inference(packet):
+            model = self.detector.model
+            packet['model'] = model
+            packet['boxes'] = model.engine.predict(packet['input'])
+        return self.apply_verdict(packet)
+    
+    def dispatch_frame(self, packet):
+        """Dispatch stage: hand the frame to the active model's worker pool or batcher"""
+        if not self.needs_inference(packet):
+            # Unchanged scene: straight to the verdict, no worker or batch slot used.
+            # apply_verdict fills in whichever result is newest by the time it gets there
+            self.results.put(packet)
+            return None
+        model = self.detector.model
+        packet['model'] = model
+        return model.dispatcher.submit(packet)
+    
+    def needs_inference(self, packet):
+        """Prepare the model input; False (packet marked to reuse detections) when unchanged"""
+        rois = self.rois
+        packet['rois'] = rois
+        packet['input'], packet['roi_layout'] = build_roi_mosaic(packet['frame'], rois)
+        packet['reuse'] = False
+        if self.gate is None:
+            return True
+        last = self.last_result
+        # A fresh model or ROI set, or no result yet, always runs. Only the ROIs are compared
+        force = last is None or last[0] is not self.detector.model or last[2] is not rois
+        if self.gate.check(packet['input'], force=force):
+            return True
+        packet['reuse'] = True
+        packet['roi_layout'] = None
+        return False
+    
+    def set_rois(self, rois):
+        """Replace the station's ROIs; takes effect from the next frame"""
+        self.rois = normalize_rois(rois)
+    
+    def apply_verdict(self, packet):
+        """Turn a packet's detections into verdict and statistics"""
+        # Frames still in flight on a swapped-out model can finish after newer ones
+        if packet['seq'] <= self.last_inferred_seq:
+            return None
+        if packet['reuse']:
+            # Gate-skipped frames overtake inferred ones still in flight, so they take the
+            # newest result now; an older inferred frame arriving later is still applied
+            if self.last_result is None:
+                return None
+            packet['model'], packet['boxes'] = self.last_result[:2]
+        else:
+            self.last_inferred_seq = packet['seq']
+            if packet['roi_layout'] is not None:
+                packet['boxes'] = map_roi_boxes(packet['boxes'], packet['roi_layout'])
+            self.last_result = (packet['model'], packet['boxes'], packet['rois'])
+        # A newer skipped frame may already be on screen; don't step the video back
+        superseded = packet['seq'] < self.last_seq
+        self.last_seq = max(self.last_seq, packet['seq'])
+        defects_detected, detections = self.detector.process_detections(packet['boxes'], packet['model'])
+        
+        # Determine status based on detection logic
+        current_status = self.determine_status(defects_detected)
+        
+        self.detection_results['has_defects'] = defects_detected
+        self.detection_results['detections'] = detections
+        self.detection_results['status'] = current_status
+        self.detection_results['frame_age_ms'] = int((time.time() - packet['timestamp']) * 1000)
+        self.detection_results['dropped_frames'] = self.grabber.dropped if self.grabber else 0
+        
+        # Parts are counted by the tracker, one verdict each, at any line speed
+        is_defect = np.fromiter((d['is_defect'] for d in detections), dtype=bool, count=len(detections))
+        track_ids, finished = self.tracker.update(packet['boxes'].xyxy, is_defect)
+        for detection, track_id in zip(detections, track_ids):
+            if track_id is not None:
+                detection['track_id'] = track_id
+        self.update_statistics(finished)
+        self.calculate_fps()
+        
+        packet['defects_detected'] = defects_detected
+        packet['detections'] = detections
+        packet['status'] = current_status
+        packet['fps'] = self.detection_results['fps']
+        # Drawing and JPEG encoding are only worth doing for someone watching
+        packet['render'] = self.broadcaster.has_viewers() and not superseded
+        return packet
+    
+    def annotate_frame(self, packet):
+        """Annotate stage: optionally draw overlays, then downscale for streaming"""
+        if not packet['render']:
+            return packet
+        frame = packet['frame']
+        if RENDER_CONFIG['server_overlay']:
+            self.draw_detections(frame, packet['detections'])
+            self.draw_status(frame, packet['status'], packet['fps'])
+        self.current_frame = frame
+        
+        height, width = frame.shape[:2]
+        stream_width = RENDER_CONFIG['stream_width']
+        if stream_width and width > stream_width:
+            stream_height = int(round(height * stream_width / width))
+            frame = cv2.resize(frame, (stream_width, stream_height), interpolation=cv2.INTER_AREA)
+        packet['stream_frame'] = frame
+        packet['source_size'] = (width, height)
+        return packet
+    
+    def get_overlay_data(self, packet):
+        """Compact detection list for client-side drawing, in source frame pixels"""
+        return {
+            'width': packet['source_size'][0],
+            'height': packet['source_size'][1],
+            'status': packet['status'],
+            'fps': packet['fps'],
+            'drawn': RENDER_CONFIG['server_overlay'],
+            # [x1, y1, x2, y2, confidence, class_id]
+            'boxes': [[round(v) for v in d['bbox']] + [round(d['confidence'], 2), d['class_id']]
+                      for d in packet['detections']]
+        }
+    
+    def encode_frame(self, packet):
+        """Encode stage: JPEG bytes, sent as a binary Socket.IO attachment"""
+        if not packet['render']:
+            return packet
+        ret, buffer = cv2.imencode('.jpg', packet['stream_frame'], 
+                                [cv2.IMWRITE_JPEG_QUALITY, RENDER_CONFIG['jpeg_quality']])
+        if ret:
+            packet['frame_bytes'] = buffer.tobytes()
+        return packet
+    
+    def emit_frame(self, packet):
+        """Emit stage: send detection results and frame to clients"""
+        # Each channel's payload is only built when the channel has members
+        if self.has_subscribers('stats'):
+            stats = self.detection_results['stats']
+            socketio.emit('detection_result', {
+                'station': self.name,
+                'status': packet['status'],
+                'defects_detected': packet['defects_detected'],
+                'pass_count': stats['pass'],
+                'ng_count': stats['ng'],
+                'total_count': stats['total'],
+                'ng_rate': round((stats['ng'] / max(1, stats['total']) * 100), 1),
+                'model': packet['model'].name,
+                'pipeline': self.detection_results['pipeline'],
+                'viewers': self.detection_results['viewers'],
+                'dispatcher': self.detection_results['dispatcher']
+            }, to=self.channel_room('stats'))
+        if self.has_subscribers('detections'):
+            socketio.emit('detections', {
+                'station': self.name,
+                'seq': packet['seq'],
+                'timestamp': packet['timestamp'],
+                'model': packet['model'].name,
+                'status': packet['status'],
+                'detections': packet['detections']
+            }, to=self.channel_room('detections'))
+        # Frame is encoded once and fanned out with per-client backpressure
+        if 'frame_bytes' in packet:
+            self.broadcaster.publish({'frame': packet['frame_bytes'],
+                                      'overlay': self.get_overlay_data(packet)})
+    
+    def build_pipeline(self):
+        """Wire capture -> infer -> annotate -> encode -> emit stages"""
+        queues = {name: BoundedQueue(cfg['queue_size'], cfg['drop_policy'])
+                  for name, cfg in PIPELINE_CONFIG.items()}
+        model = self.detector.model
+        if model.dispatcher is not None:
+            # dispatch hands frames to the worker pool or micro-batcher; infer consumes
+            # results in frame order. A model swap attaches this same result queue
+            # to the new model's dispatcher
+            model.dispatcher.reset(self.name)
+            self.results = model.dispatcher.output(self.name)
+            inference_stages = [
+                PipelineStage('dispatch', self.dispatch_frame, self.grabber),
+                PipelineStage('infer', self.apply_verdict, self.results, queues['annotate']),
+            ]
+        else:
+            inference_stages = [PipelineStage('infer', self.run_inference, self.grabber, queues['annotate'])]
+        return inference_stages + [
+            PipelineStage('annotate', self.annotate_frame, queues['annotate'], queues['encode']),
+            PipelineStage('encode', self.encode_frame, queues['encode'], queues['emit']),
+            PipelineStage('emit', self.emit_frame, queues['emit']),
+        ]
     
     def start_detection(self):
         """Start detection system"""
+        if self.is_running:
+            return True
+        if not self.detector.wait_until_ready(POOL_CONFIG['startup_timeout']):
+            logger.warning('start_without_model', station=self.name,
+                           error=self.detector.model_status['error'])
+            return False
         if self.initialize_camera():
-            self.is_running = True
-            threading.Thread(target=self.generate_frames, daemon=True).start()
+            self.grabber = FrameGrabber(self.camera, source=self.name)
+            self.grabber.start()
+            self.last_seq = -1
+            self.last_inferred_seq = -1
+            self.last_result = None
+            self.gate = None
+            if GATE_CONFIG['enabled']:
+                self.gate = MotionGate(GATE_CONFIG['size'], GATE_CONFIG['pixel_threshold'],
+                                       GATE_CONFIG['area_threshold'], GATE_CONFIG['max_skip'])
+            with self.detector.swap_lock:
+                self.is_running = True
+                self.stages = self.build_pipeline()
+            for stage in self.stages:
+                stage.start()
             return True
         return False
     
     def stop_detection(self):
         """Stop detection system"""
         self.is_running = False
+        if self.grabber:
+            self.grabber.stop()
+        for stage in self.stages:
+            stage.is_running = False
+            if isinstance(stage.input_queue, BoundedQueue):
+                stage.input_queue.close()
+        for stage in self.stages:
+            stage.stop()
+        self.stages = []
+        # Parts still in view when the line stops get their verdict now
+        self.update_statistics(self.tracker.flush())
+        self.grabber = None
         if self.camera:
             self.camera.release()
             self.camera = None
@@ -235,8 +2089,252 @@ class YOLODetectionSystem:
         time.sleep(0.5)
         return self.start_detection()
 
-# Initialize detection system
-detector = YOLODetectionSystem()
+class LoadedModel:
+    """One loaded model version: its engine or dispatcher and resolved class table"""
+    def __init__(self, name, path, backend, engine, dispatcher, class_names, defect_lut):
+        self.name = name
+        self.path = path
+        self.backend = backend
+        self.engine = engine
+        self.dispatcher = dispatcher
+        self.class_names = class_names
+        self.defect_lut = defect_lut
+    
+    def close(self):
+        """Release the model's worker processes or batch thread"""
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+
+class YOLODetectionSystem:
+    def __init__(self, model=None):
+        self.registry = dict(MODEL_REGISTRY)
+        model = INFERENCE_CONFIG['model_path'] or model or next(iter(self.registry))
+        if model not in self.registry:
+            # A startup model given as a path is registered under its file name
+            path, model = model, os.path.splitext(os.path.basename(str(model).rstrip('/\\')))[0]
+            if self.registry.get(model, path) != path:
+                model = path
+            self.registry[model] = path
+        self.initial_model = model
+        
+        # Active model, and the one it replaced (kept loaded for instant rollback).
+        # Stations read self.model once per frame, so a swap takes effect between frames
+        self.model = None
+        self.previous_model = None
+        self.swap_lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        
+        # The model loads in the background so the web UI is up before it is ready
+        self.model_ready = threading.Event()
+        self.model_status = {'state': 'loading', 'step': 'Starting', 'progress': 0.0, 'error': None,
+                             'models': list(self.registry), 'active': None, 'previous': None}
+        
+        # All stations share the loaded model and its worker pool / batcher
+        self.stations = {name: Station(name, self, **settings) for name, settings in STATIONS_CONFIG.items()}
+        for name, rois in load_saved_rois().items():
+            if name in self.stations:
+                try:
+                    self.stations[name].set_rois(rois)
+                except (TypeError, ValueError) as e:
+                    logger.warning('rois_invalid', station=name, path=ROI_CONFIG['path'], error=str(e))
+    
+    def start_loading(self):
+        """Load the startup model in a background thread"""
+        self.switch_model(self.initial_model)
+    
+    def set_model_status(self, state, step, progress, error=None):
+        """Record model loading progress and push it to every client"""
+        self.model_status = {
+            'state': state, 'step': step, 'progress': round(progress, 2), 'error': error,
+            'models': list(self.registry),
+            'active': self.model.name if self.model else None,
+            'previous': self.previous_model.name if self.previous_model else None
+        }
+        socketio.emit('model_status', self.model_status)
+    
+    def switch_model(self, name):
+        """Load a registry model in the background and swap it in; False if unknown or busy"""
+        if name not in self.registry or not self.load_lock.acquire(blocking=False):
+            return False
+        loader = threading.Thread(target=self.load_and_swap, args=(name,), name="model-loader", daemon=True)
+        loader.start()
+        return True
+    
+    def rollback_model(self):
+        """Swap the previous model, still loaded, back in; False if there is none or busy"""
+        if self.previous_model is None or not self.load_lock.acquire(blocking=False):
+            return False
+        try:
+            self.swap_model(self.previous_model)
+        finally:
+            self.load_lock.release()
+        return True
+    
+    def load_and_swap(self, name):
+        """Model-loader thread: load a model next to the running one, then swap it in"""
+        try:
+            model = self.load_model(name)
+            if model is not None:
+                self.swap_model(model)
+        finally:
+            self.model_ready.set()
+            self.load_lock.release()
+    
+    def swap_model(self, model):
+        """Make a loaded model active for every station"""
+        with self.swap_lock:
+            # Running stations keep their result queue; the new dispatcher feeds it
+            for station in self.stations.values():
+                if station.is_running and model.dispatcher is not None:
+                    model.dispatcher.attach(station.name, station.results)
+            retired = self.previous_model
+            self.previous_model, self.model = self.model, model
+        
+        # Only the model just replaced stays resident for rollback
+        if retired is not None and retired is not model:
+            retired.close()
+        logger.info('model_swapped', model=model.name, model_path=model.path,
+                    previous=self.previous_model.name if self.previous_model else None)
+        self.set_model_status('ready', "Model ready", 1.0)
+        socketio.emit('model_info', self.get_model_info())
+    
+    def load_model(self, name):
+        """Load the inference engine (or start a worker pool) and build the defect table"""
+        model_path = self.registry[name]
+        started = time.time()
+        try:
+            # Export .pt weights for an exported-graph backend once, before any worker needs them
+            # (plus the cascade's screening size, a separate fixed-shape graph)
+            engine_class = ENGINES.get(INFERENCE_CONFIG['backend'] or detect_backend(model_path))
+            screen_path = None
+            if getattr(engine_class, 'export_format', None) and str(model_path).endswith('.pt'):
+                self.set_model_status('loading', f"Exporting {os.path.basename(model_path)}", 0.05)
+                weights_path = model_path
+                model_path = export_cached(weights_path, engine_class.export_format, INFERENCE_CONFIG['imgsz'])
+                if CASCADE_CONFIG['enabled']:
+                    screen_path = export_cached(weights_path, engine_class.export_format,
+                                                CASCADE_CONFIG['screen_imgsz'])
+            
+            engine = None
+            if POOL_CONFIG['workers'] > 0:
+                workers = POOL_CONFIG['workers']
+                self.set_model_status('loading', f"Starting {workers} inference workers", 0.1)
+                dispatcher = InferencePool(
+                    model_path, workers, backend=INFERENCE_CONFIG['backend'], slots=POOL_CONFIG['slots'],
+                    max_batch=BATCH_CONFIG['max_batch'], max_wait_ms=BATCH_CONFIG['max_wait_ms'],
+                    progress=lambda ready, total: self.set_model_status(
+                        'loading', f"Inference workers ready: {ready}/{total}", 0.1 + 0.8 * ready / total),
+                    screen_path=screen_path)
+                atexit.register(dispatcher.close)
+                model = dispatcher
+            else:
+                self.set_model_status('loading', f"Loading {os.path.basename(model_path)}", 0.1)
+                engine = create_engine(model_path, screen_path=screen_path)
+                self.set_model_status('loading', "Warming up", 0.6)
+                warmup_ms = engine.warmup(WARMUP_CONFIG['frame_size'], WARMUP_CONFIG['runs'],
+                                          BATCH_CONFIG['max_batch'])
+                logger.info('model_warmup', backend=engine.name, ms=round(warmup_ms, 1))
+                model = engine
+                dispatcher = None
+                if BATCH_CONFIG['max_batch'] > 1:
+                    dispatcher = MicroBatcher(engine, BATCH_CONFIG['max_batch'], BATCH_CONFIG['max_wait_ms'])
+            
+            # Resolve defect classification once per model instead of per box
+            self.set_model_status('loading', "Building class table", 0.9)
+            class_names, defect_lut = build_defect_lut(model.names)
+        except Exception as e:
+            logger.error('model_load_failed', model=name, model_path=model_path, error=str(e))
+            self.set_model_status('error', "Model failed to load", 0.0, error=str(e))
+            return None
+        
+        # Log available class names for debugging
+        logger.info('model_loaded', model=name, model_path=model_path, backend=model.name,
+                    workers=POOL_CONFIG['workers'], max_batch=BATCH_CONFIG['max_batch'],
+                    load_s=round(time.time() - started, 1),
+                    classes={i: class_name for i, class_name in enumerate(class_names)},
+                    defect_classes=[class_name for i, class_name in enumerate(class_names) if defect_lut[i]])
+        return LoadedModel(name, model_path, model.name, engine, dispatcher, class_names, defect_lut)
+    
+    def wait_until_ready(self, timeout=None):
+        """Block until the first model load finished; False if no model is loaded"""
+        return self.model_ready.wait(timeout) and self.model is not None
+    
+    def process_detections(self, boxes, model=None):
+        """Process detection results from any inference backend"""
+        model = model or self.model
+        defects_detected = False
+        detections = []
+        
+        if boxes is not None and len(boxes) > 0:
+            xyxy = boxes.xyxy
+            confidences = boxes.conf
+            class_ids = boxes.cls
+            
+            # Class ids outside the model's table fall back to the last (unknown) slot
+            class_names = model.class_names
+            is_defect = lookup_defects(model.defect_lut, class_ids)
+            defects_detected = bool(is_defect.any())
+            
+            for bbox, confidence, class_id, defect in zip(
+                    xyxy.tolist(), confidences.tolist(), class_ids.tolist(), is_defect.tolist()):
+                class_name = class_names[class_id] if 0 <= class_id < len(class_names) else f"Class_{class_id}"
+                detections.append({
+                    'class': class_name,
+                    'class_id': class_id,
+                    'confidence': confidence,
+                    'bbox': bbox,
+                    'is_defect': defect
+                })
+        
+            # Debug: log detections, sampled so the hot loop never floods the sink
+            if logger.is_enabled('debug'):
+                logger.debug('detections', count=len(detections),
+                             detections=[(d['class'], round(d['confidence'], 2)) for d in detections],
+                             rate_limit=1.0)
+            if defects_detected:
+                logger.info('sg_defect_detected',
+                            classes=sorted({d['class'] for d in detections if d['is_defect']}),
+                            rate_limit=1.0)
+        
+        return defects_detected, detections
+    
+    def get_model_info(self):
+        """Class table the dashboard needs to label boxes"""
+        return {
+            'model': self.model.name,
+            'classes': self.model.class_names,
+            'defect_classes': [bool(flag) for flag in self.model.defect_lut[:len(self.model.class_names)]]
+        }
+    
+    def get_station(self, name=None):
+        """Look up a station by name, defaulting to the first configured one"""
+        if name is None:
+            return next(iter(self.stations.values()))
+        return self.stations.get(name)
+    
+    def start_detection(self, station=None):
+        """Start detection on one station"""
+        return self.get_station(station).start_detection()
+    
+    def stop_detection(self, station=None):
+        """Stop detection on one station"""
+        self.get_station(station).stop_detection()
+    
+    def restart_detection(self, station=None):
+        """Restart detection on one station"""
+        return self.get_station(station).restart_detection()
+
+# Initialize detection system, exactly once per server. Inference worker processes
+# re-import this file (as __mp_main__, or by module name under gunicorn) and only
+# need the engine classes, not a detector of their own. Run as a script without
+# debug, this process only launches gunicorn, whose worker imports the file again
+LAUNCHER = __name__ == '__main__' and not SERVER_CONFIG['debug']
+if multiprocessing.current_process().name == 'MainProcess' and not LAUNCHER:
+    detector = YOLODetectionSystem()
+    detector.start_loading()
+
+# Client sid -> name of the station it is watching
+client_stations = {}
 
 @app.route('/')
 def index():
@@ -289,6 +2387,24 @@ def index():
 </head>
 <body class="bg-gray-100">
     <div class="container mx-auto px-4 py-6">
+        <div class="flex items-center justify-end mb-4 space-x-2">
+            <label for="stationSelect" class="text-sm font-medium text-gray-600">Station</label>
+            <select id="stationSelect" class="border rounded-lg px-3 py-1 bg-white"></select>
+            <label for="modelSelect" class="text-sm font-medium text-gray-600 pl-4">Model</label>
+            <select id="modelSelect" class="border rounded-lg px-3 py-1 bg-white" disabled></select>
+            <button id="rollbackBtn" class="bg-gray-600 hover:bg-gray-700 text-white text-sm py-1 px-3 rounded-lg transition" disabled>
+                Rollback
+            </button>
+        </div>
+        <div id="modelStatus" class="hidden bg-white rounded-lg shadow-lg mb-6 p-4">
+            <div class="flex justify-between text-sm font-medium text-gray-600 mb-2">
+                <span id="modelStep">Loading model</span>
+                <span id="modelProgress">0%</span>
+            </div>
+            <div class="w-full bg-gray-200 rounded-full h-2">
+                <div id="modelProgressBar" class="bg-blue-500 h-2 rounded-full" style="width: 0%"></div>
+            </div>
+        </div>
         <div id="detectionBanner" class="detection-banner rounded-lg shadow-lg mb-6 py-8 text-center pass-bg">
             <div class="flex items-center justify-center mb-2">
                 <div id="statusIndicator" class="status-indicator status-pass"></div>
@@ -305,7 +2421,27 @@ def index():
                         <p class="text-sm text-gray-500">Real-time SG-defect detection</p>
                     </div>
                     <div class="video-container">
-                        <img id="videoFeed" class="video-feed" src="" alt="Video Feed">
+                        <canvas id="videoFeed" class="video-feed"></canvas>
+                        <canvas id="overlayCanvas" class="video-feed"></canvas>
+                    </div>
+                    <div class="flex space-x-4 px-4 py-2 border-t text-sm text-gray-600">
+                        <label class="flex items-center space-x-2">
+                            <input id="showBoxesToggle" type="checkbox" checked>
+                            <span>Boxes</span>
+                        </label>
+                        <label class="flex items-center space-x-2">
+                            <input id="showLabelsToggle" type="checkbox" checked>
+                            <span>Labels</span>
+                        </label>
+                        <label class="flex items-center space-x-2">
+                            <input id="showStatusToggle" type="checkbox" checked>
+                            <span>Status panel</span>
+                        </label>
+                        <div class="ml-auto flex space-x-4">
+                            <span id="roiMessage" class="text-red-600"></span>
+                            <button id="clearRoiBtn" class="hidden text-blue-600 hover:underline">Clear</button>
+                            <button id="editRoiBtn" class="text-blue-600 hover:underline">Edit ROIs</button>
+                        </div>
                     </div>
                 </div>
             </div>
@@ -324,6 +2460,10 @@ def index():
                         <button id="restartBtn" class="bg-gray-600 hover:bg-gray-700 text-white font-bold py-3 px-4 rounded-lg transition" disabled>
                             Restart System
                         </button>
+                        <label class="flex items-center space-x-2 text-sm text-gray-600">
+                            <input id="debugLogToggle" type="checkbox">
+                            <span>Debug logging</span>
+                        </label>
                     </div>
                 </div>
 
@@ -362,6 +2502,11 @@ def index():
                         </div>
                     </div>
                 </div>
+
+                <div class="bg-white rounded-lg shadow-lg p-6 mt-6">
+                    <h2 class="text-2xl font-bold text-gray-800 mb-4">Pipeline</h2>
+                    <div id="pipelineStats" class="space-y-2 text-sm text-gray-600"></div>
+                </div>
             </div>
         </div>
     </div>
@@ -369,6 +2514,17 @@ def index():
     <script>
         const socket = io();
         const videoFeed = document.getElementById('videoFeed');
+        const videoContext = videoFeed.getContext('2d');
+        const overlayCanvas = document.getElementById('overlayCanvas');
+        const overlayContext = overlayCanvas.getContext('2d');
+        const showBoxesToggle = document.getElementById('showBoxesToggle');
+        const editRoiBtn = document.getElementById('editRoiBtn');
+        const roiMessage = document.getElementById('roiMessage');
+        const clearRoiBtn = document.getElementById('clearRoiBtn');
+        const showLabelsToggle = document.getElementById('showLabelsToggle');
+        const showStatusToggle = document.getElementById('showStatusToggle');
+        let modelInfo = {classes: [], defect_classes: []};
+        let lastOverlay = null;
         const detectionBanner = document.getElementById('detectionBanner');
         const detectionStatus = document.getElementById('detectionStatus');
         const detectionDetail = document.getElementById('detectionDetail');
@@ -376,12 +2532,22 @@ def index():
         const startBtn = document.getElementById('startBtn');
         const stopBtn = document.getElementById('stopBtn');
         const restartBtn = document.getElementById('restartBtn');
+        const stationSelect = document.getElementById('stationSelect');
+        const modelStatus = document.getElementById('modelStatus');
+        const modelSelect = document.getElementById('modelSelect');
+        const rollbackBtn = document.getElementById('rollbackBtn');
+        const modelStep = document.getElementById('modelStep');
+        const modelProgress = document.getElementById('modelProgress');
+        const modelProgressBar = document.getElementById('modelProgressBar');
+        let currentStation = null;
+        const debugLogToggle = document.getElementById('debugLogToggle');
         const defectStatus = document.getElementById('defectStatus');
         const currentStatus = document.getElementById('currentStatus');
         const passCount = document.getElementById('passCount');
         const ngCount = document.getElementById('ngCount');
         const totalCount = document.getElementById('totalCount');
         const ngRate = document.getElementById('ngRate');
+        const pipelineStats = document.getElementById('pipelineStats');
 
         function updateButtonStates(isRunning) {
             startBtn.disabled = isRunning;
@@ -389,6 +2555,18 @@ def index():
             restartBtn.disabled = !isRunning;
         }
 
+        function updatePipelineStats(stages) {
+            if (!stages) return;
+            pipelineStats.innerHTML = stages.map((stage) =>
+                '<div class="flex justify-between">' +
+                    '<span class="font-medium">' + stage.name + '</span>' +
+                    '<span>' + stage.avg_ms + ' ms, ' + (stage.skip_ratio !== undefined
+                        ? 'skipped ' + Math.round(stage.skip_ratio * 100) + '%'
+                        : 'dropped ' + stage.dropped) + '</span>' +
+                '</div>'
+            ).join('');
+        }
+
         function updateStatusDisplay(status, defectsDetected) {
             // Update status indicator and banner
             if (status === 'PASS') {
@@ -416,64 +2594,463 @@ def index():
         }
 
         startBtn.addEventListener('click', () => {
-            socket.emit('start_detection');
+            socket.emit('start_detection', {station: currentStation});
         });
 
         stopBtn.addEventListener('click', () => {
-            socket.emit('stop_detection');
+            socket.emit('stop_detection', {station: currentStation});
         });
 
         restartBtn.addEventListener('click', () => {
-            socket.emit('restart_system');
+            socket.emit('restart_system', {station: currentStation});
+        });
+
+        debugLogToggle.addEventListener('change', () => {
+            socket.emit('set_log_level', {level: debugLogToggle.checked ? 'debug' : 'info'});
+        });
+
+        socket.on('log_level', (data) => {
+            debugLogToggle.checked = data.level === 'debug';
+        });
+
+        // Only ask for video while the page is visible, so hidden tabs cost no encoding
+        function updateVideoSubscription() {
+            if (!currentStation) return;
+            socket.emit(document.hidden ? 'unsubscribe' : 'subscribe', {channels: ['video']});
+        }
+
+        document.addEventListener('visibilitychange', updateVideoSubscription);
+
+        function clearDisplay() {
+            pendingFrame = null;
+            lastOverlay = null;
+            videoContext.clearRect(0, 0, videoFeed.width, videoFeed.height);
+            overlayContext.clearRect(0, 0, overlayCanvas.width, overlayCanvas.height);
+            updateStatusDisplay('PASS', false);
+        }
+
+        // Each client follows one station; the server only sends that station's traffic
+        function joinStation(name) {
+            currentStation = name;
+            localStorage.setItem('station', name);
+            stationSelect.value = name;
+            clearDisplay();
+            socket.emit('join_station', {station: name});
+        }
+
+        stationSelect.addEventListener('change', () => {
+            joinStation(stationSelect.value);
         });
 
         socket.on('connect', () => {
             console.log('Connected to server');
         });
 
+        socket.on('stations', (data) => {
+            stationSelect.innerHTML = data.stations.map((name) =>
+                '<option value="' + name + '">' + name + '</option>'
+            ).join('');
+            const saved = localStorage.getItem('station');
+            joinStation(data.stations.includes(saved) ? saved : data.default);
+        });
+
+        socket.on('station_joined', (data) => {
+            updateButtonStates(data.is_running);
+            stationRois = data.rois || [];
+            setRoiEditing(false);
+            // Status and counters always; video only while the tab is visible
+            socket.emit('subscribe', {channels: ['stats']});
+            updateVideoSubscription();
+        });
+
         socket.on('system_status', (data) => {
+            if (data.station && data.station !== currentStation) return;
             updateButtonStates(data.is_running);
             if (!data.is_running) {
-                videoFeed.src = '';
-                updateStatusDisplay('PASS', false);
+                clearDisplay();
+            }
+        });
+
+        // Binary JPEG frames are decoded off the main thread; while one is decoding
+        // only the newest arriving frame is kept
+        let pendingFrame = null;
+        let decodingFrame = false;
+
+        function drawLabel(text, x, y, color, font) {
+            overlayContext.font = font;
+            const textWidth = overlayContext.measureText(text).width;
+            overlayContext.fillStyle = color;
+            overlayContext.fillRect(x, y - 20, textWidth + 4, 20);
+            overlayContext.fillStyle = '#FFFFFF';
+            overlayContext.fillText(text, x + 2, y - 5);
+        }
+
+        // Boxes and the status panel are drawn here instead of on the server
+        function drawRois(scale) {
+            const rois = draftRoi ? stationRois.concat([draftRoi]) : stationRois;
+            if (!rois.length || !(editingRois || showBoxesToggle.checked)) return;
+            overlayContext.save();
+            overlayContext.setLineDash([8, 6]);
+            overlayContext.lineWidth = 2;
+            overlayContext.strokeStyle = '#FACC15';
+            rois.forEach(([x1, y1, x2, y2]) => {
+                overlayContext.strokeRect(x1 * scale, y1 * scale, (x2 - x1) * scale, (y2 - y1) * scale);
+            });
+            overlayContext.restore();
+        }
+
+        function drawOverlay() {
+            overlayContext.clearRect(0, 0, overlayCanvas.width, overlayCanvas.height);
+            const overlay = lastOverlay;
+            if (!overlay) return;
+            const scale = overlayCanvas.width / overlay.width;
+            drawRois(scale);
+            if (overlay.drawn) return;
+
+            if (showBoxesToggle.checked) {
+                overlayContext.lineWidth = 2;
+                overlay.boxes.forEach(([x1, y1, x2, y2, confidence, classId]) => {
+                    const isDefect = modelInfo.defect_classes[classId] === true;
+                    const color = isDefect ? '#FF0000' : '#00FF00';
+                    const className = modelInfo.classes[classId] || ('Class_' + classId);
+                    overlayContext.strokeStyle = color;
+                    overlayContext.strokeRect(x1 * scale, y1 * scale, (x2 - x1) * scale, (y2 - y1) * scale);
+                    if (showLabelsToggle.checked) {
+                        const status = isDefect ? 'SG-DEFECT' : className.toUpperCase();
+                        drawLabel(status + ' ' + confidence.toFixed(2), x1 * scale, y1 * scale, color, 'bold 14px sans-serif');
+                    }
+                });
             }
+
+            if (showStatusToggle.checked) {
+                const isPass = overlay.status === 'PASS';
+                overlayContext.fillStyle = 'rgba(0, 0, 0, 0.7)';
+                overlayContext.fillRect(5 * scale, 5 * scale, 645 * scale, 75 * scale);
+                overlayContext.fillStyle = '#FFFFFF';
+                overlayContext.font = 'bold ' + Math.round(18 * scale) + 'px sans-serif';
+                overlayContext.fillText('FPS: ' + overlay.fps, 10 * scale, 25 * scale);
+                overlayContext.fillStyle = isPass ? '#00FF00' : '#FF0000';
+                overlayContext.font = 'bold ' + Math.round(22 * scale) + 'px sans-serif';
+                overlayContext.fillText('Status: ' + overlay.status, 10 * scale, 50 * scale);
+                overlayContext.fillStyle = '#FFFFFF';
+                overlayContext.font = Math.round(15 * scale) + 'px sans-serif';
+                overlayContext.fillText(isPass ? 'No SG-defects detected' : 'SG-defect detected!', 10 * scale, 70 * scale);
+            }
+        }
+
+        [showBoxesToggle, showLabelsToggle, showStatusToggle].forEach((toggle) => {
+            toggle.addEventListener('change', drawOverlay);
+        });
+
+        // Regions of interest in source frame pixels; drag on the video to add one
+        let stationRois = [];
+        let editingRois = false;
+        let draftRoi = null;
+
+        function canvasToSource(event) {
+            // The canvas is scaled with object-fit: cover, so undo that first
+            const rect = overlayCanvas.getBoundingClientRect();
+            const fit = Math.max(rect.width / overlayCanvas.width, rect.height / overlayCanvas.height);
+            const x = (event.clientX - rect.left - (rect.width - overlayCanvas.width * fit) / 2) / fit;
+            const y = (event.clientY - rect.top - (rect.height - overlayCanvas.height * fit) / 2) / fit;
+            const scale = overlayCanvas.width / lastOverlay.width;
+            return [Math.max(0, Math.round(x / scale)), Math.max(0, Math.round(y / scale))];
+        }
+
+        overlayCanvas.addEventListener('pointerdown', (event) => {
+            if (!editingRois || !lastOverlay) return;
+            const [x, y] = canvasToSource(event);
+            draftRoi = [x, y, x, y];
+            overlayCanvas.setPointerCapture(event.pointerId);
+        });
+
+        overlayCanvas.addEventListener('pointermove', (event) => {
+            if (!draftRoi) return;
+            [draftRoi[2], draftRoi[3]] = canvasToSource(event);
+            drawOverlay();
         });
 
-        socket.on('video_frame', (data) => {
-            videoFeed.src = 'data:image/jpeg;base64,' + data.frame;
+        overlayCanvas.addEventListener('pointerup', () => {
+            if (!draftRoi) return;
+            const [x1, y1, x2, y2] = draftRoi;
+            const roi = [Math.min(x1, x2), Math.min(y1, y2), Math.max(x1, x2), Math.max(y1, y2)];
+            // The server rejects overlapping ROIs (objects in the overlap would count twice)
+            const overlaps = stationRois.some(([a1, b1, a2, b2]) =>
+                roi[0] < a2 && a1 < roi[2] && roi[1] < b2 && b1 < roi[3]);
+            roiMessage.textContent = overlaps ? 'ROIs may not overlap' : '';
+            if (!overlaps && roi[2] - roi[0] > 10 && roi[3] - roi[1] > 10) stationRois.push(roi);
+            draftRoi = null;
+            drawOverlay();
+        });
+
+        function setRoiEditing(editing) {
+            editingRois = editing;
+            draftRoi = null;
+            editRoiBtn.textContent = editing ? 'Save ROIs' : 'Edit ROIs';
+            if (editing) roiMessage.textContent = '';
+            clearRoiBtn.classList.toggle('hidden', !editing);
+            drawOverlay();
+        }
+
+        editRoiBtn.addEventListener('click', () => {
+            if (editingRois) {
+                socket.emit('set_rois', {station: currentStation, rois: stationRois});
+            }
+            setRoiEditing(!editingRois);
+        });
+
+        clearRoiBtn.addEventListener('click', () => {
+            stationRois = [];
+            drawOverlay();
+        });
+
+        socket.on('station_rois', (data) => {
+            if (data.station !== currentStation) return;
+            roiMessage.textContent = data.message || '';
+            if (!editingRois) {
+                stationRois = data.rois;
+                drawOverlay();
+            }
+        });
+
+        function drawNextFrame() {
+            if (decodingFrame || !pendingFrame) return;
+            const frame = pendingFrame;
+            const blob = new Blob([frame.frame], {type: 'image/jpeg'});
+            pendingFrame = null;
+            decodingFrame = true;
+            createImageBitmap(blob).then((bitmap) => {
+                if (videoFeed.width !== bitmap.width || videoFeed.height !== bitmap.height) {
+                    videoFeed.width = overlayCanvas.width = bitmap.width;
+                    videoFeed.height = overlayCanvas.height = bitmap.height;
+                }
+                videoContext.drawImage(bitmap, 0, 0);
+                bitmap.close();
+                lastOverlay = frame.overlay;
+                drawOverlay();
+            }).catch((err) => {
+                console.error('Frame decode failed', err);
+            }).finally(() => {
+                decodingFrame = false;
+                drawNextFrame();
+            });
+        }
+
+        socket.on('model_info', (data) => {
+            modelInfo = data;
+        });
+
+        // Model loads in the background; show progress until it is ready
+        socket.on('model_status', (data) => {
+            const failed = Boolean(data.error);
+            const loading = data.state === 'loading';
+            const percent = Math.round(data.progress * 100) + '%';
+            modelStatus.classList.toggle('hidden', data.state === 'ready' && !failed);
+            modelStep.textContent = failed
+                ? (data.state === 'error' ? data.step + ': ' : '') + data.error
+                : 'Loading model: ' + data.step;
+            modelProgress.textContent = failed ? '' : percent;
+            modelProgressBar.style.width = failed ? '100%' : percent;
+            modelProgressBar.className = (failed ? 'bg-red-500' : 'bg-blue-500') + ' h-2 rounded-full';
+
+            // Registry picker: swapping loads in the background, video and stats keep flowing
+            modelSelect.innerHTML = data.models.map((name) =>
+                '<option value="' + name + '">' + name + '</option>'
+            ).join('');
+            modelSelect.value = data.active || '';
+            modelSelect.disabled = loading;
+            rollbackBtn.disabled = loading || !data.previous;
+            rollbackBtn.title = data.previous ? 'Back to ' + data.previous : '';
+        });
+
+        modelSelect.addEventListener('change', () => {
+            socket.emit('switch_model', {model: modelSelect.value});
+        });
+
+        rollbackBtn.addEventListener('click', () => {
+            socket.emit('rollback_model');
+        });
+
+        socket.on('video_frame', (data, ack) => {
+            pendingFrame = data;
+            drawNextFrame();
+            // Acknowledge so the server releases the next frame for this client
+            if (ack) ack();
         });
 
         socket.on('detection_result', (data) => {
+            if (data.station !== currentStation) return;
             updateStatusDisplay(data.status, data.defects_detected);
             
             passCount.textContent = data.pass_count;
             ngCount.textContent = data.ng_count;
             totalCount.textContent = data.total_count;
             ngRate.textContent = data.ng_rate + '%';
+            updatePipelineStats(data.pipeline);
         });
     </script>
 </body>
 </html>
     '''
 
+def get_client_station(data=None):
+    """Station named in the event payload, else the one this client joined"""
+    name = (data or {}).get('station') or client_stations.get(request.sid)
+    return detector.get_station(name)
+
+def require_client_station(data=None):
+    """get_client_station for control events, telling the client when the station is unknown"""
+    station = get_client_station(data)
+    if station is None:
+        emit('system_status', {'is_running': False, 'message': f"Unknown station: {(data or {}).get('station')}"})
+    return station
+
+@socketio.on('connect')
+def handle_connect():
+    emit('stations', {'stations': list(detector.stations), 'default': detector.get_station().name})
+    emit('model_status', detector.model_status)
+
+@socketio.on('join_station')
+def handle_join_station(data=None):
+    name = (data or {}).get('station')
+    station = detector.get_station(name)
+    if station is None:
+        emit('system_status', {'is_running': False, 'message': f"Unknown station: {name}"})
+        return
+    
+    # A client follows exactly one station; switching drops its old subscriptions
+    previous = detector.stations.get(client_stations.get(request.sid))
+    if previous is not None:
+        leave_room(previous.room)
+        for channel in CHANNELS:
+            previous.unsubscribe(request.sid, channel)
+            leave_room(previous.channel_room(channel))
+    join_room(station.room)
+    client_stations[request.sid] = station.name
+    emit('station_joined', {'station': station.name, 'is_running': station.is_running, 'rois': station.rois})
+
+def get_requested_channels(data):
+    """Known channels named in a subscribe/unsubscribe payload (all by default)"""
+    channels = (data or {}).get('channels', CHANNELS)
+    return [channel for channel in CHANNELS if channel in channels]
+
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    station = get_client_station()
+    if station is None:
+        return
+    channels = get_requested_channels(data)
+    for channel in channels:
+        station.subscribe(request.sid, channel)
+        join_room(station.channel_room(channel))
+    # model_ready is also set when loading failed, with no model to describe
+    if 'video' in channels and detector.model is not None:
+        emit('model_info', detector.get_model_info())
+    emit('subscribed', {'station': station.name, 'channels': station.get_channels(request.sid)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data=None):
+    station = get_client_station()
+    if station is None:
+        return
+    for channel in get_requested_channels(data):
+        station.unsubscribe(request.sid, channel)
+        leave_room(station.channel_room(channel))
+    emit('subscribed', {'station': station.name, 'channels': station.get_channels(request.sid)})
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    for station in detector.stations.values():
+        for channel in CHANNELS:
+            station.unsubscribe(request.sid, channel)
+    client_stations.pop(request.sid, None)
+
 @socketio.on('start_detection')
-def handle_start_detection():
-    if detector.start_detection():
-        emit('system_status', {'is_running': True})
+def handle_start_detection(data=None):
+    station = require_client_station(data)
+    if station is None:
+        return
+    if station.start_detection():
+        socketio.emit('system_status', {'station': station.name, 'is_running': True}, to=station.room)
     else:
-        emit('system_status', {'is_running': False, 'message': 'Failed to initialize camera'})
+        error = detector.model_status['error']
+        emit('system_status', {'station': station.name, 'is_running': False,
+                               'message': f"Model failed to load: {error}" if error
+                                          else 'Failed to initialize camera'})
 
 @socketio.on('stop_detection')
-def handle_stop_detection():
-    detector.stop_detection()
-    emit('system_status', {'is_running': False})
+def handle_stop_detection(data=None):
+    station = require_client_station(data)
+    if station is None:
+        return
+    station.stop_detection()
+    socketio.emit('system_status', {'station': station.name, 'is_running': False}, to=station.room)
+
+@socketio.on('set_log_level')
+def handle_set_log_level(data=None):
+    try:
+        logger.set_level((data or {}).get('level', 'info'))
+    except ValueError as e:
+        emit('log_level', {'level': logger.get_level(), 'message': str(e)})
+        return
+    logger.info('log_level_changed', min_level=logger.get_level())
+    emit('log_level', {'level': logger.get_level()})
+
+@socketio.on('set_rois')
+def handle_set_rois(data=None):
+    station = require_client_station(data)
+    if station is None:
+        return
+    try:
+        station.set_rois((data or {}).get('rois') or [])
+    except (TypeError, ValueError) as e:
+        emit('station_rois', {'station': station.name, 'rois': station.rois, 'message': str(e)})
+        return
+    try:
+        save_rois(detector.stations)
+    except OSError as e:
+        logger.error('rois_save_failed', path=ROI_CONFIG['path'], error=str(e))
+    logger.info('rois_changed', station=station.name, rois=station.rois)
+    socketio.emit('station_rois', {'station': station.name, 'rois': station.rois}, to=station.room)
+
+@socketio.on('switch_model')
+def handle_switch_model(data=None):
+    name = (data or {}).get('model')
+    if not detector.switch_model(name):
+        error = (f"Unknown model: {name}" if name not in detector.registry
+                 else "Another model is still loading")
+        emit('model_status', dict(detector.model_status, error=error))
+
+@socketio.on('rollback_model')
+def handle_rollback_model():
+    if not detector.rollback_model():
+        emit('model_status', dict(detector.model_status, error="No previous model to roll back to"))
 
 @socketio.on('restart_system')
-def handle_restart_system():
-    if detector.restart_detection():
-        emit('system_status', {'is_running': True})
+def handle_restart_system(data=None):
+    station = require_client_station(data)
+    if station is None:
+        return
+    if station.restart_detection():
+        socketio.emit('system_status', {'station': station.name, 'is_running': True}, to=station.room)
     else:
-        emit('system_status', {'is_running': False, 'message': 'Failed to restart detection'})
+        emit('system_status', {'station': station.name, 'is_running': False,
+                               'message': 'Failed to restart detection'})
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    if LAUNCHER:
+        try:
+            from gunicorn.app.wsgiapp import run
+        except ImportError:
+            sys.exit("gunicorn is required to serve the dashboard (pip install gunicorn); "
+                     "set DASHBOARD_DEBUG=1 for the development server")
+        logger.info('server_starting', host=SERVER_CONFIG['host'], port=SERVER_CONFIG['port'],
+                    server='gunicorn', async_mode=socketio.async_mode)
+        sys.argv = [sys.argv[0], '--config',
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')]
+        run()
+    else:
+        logger.info('server_starting', host=SERVER_CONFIG['host'], port=SERVER_CONFIG['port'],
+                    server='werkzeug', debug=True, async_mode=socketio.async_mode)
+        socketio.run(app, host=SERVER_CONFIG['host'], port=SERVER_CONFIG['port'], debug=True,
+                     use_reloader=False, log_output=True, allow_unsafe_werkzeug=True)
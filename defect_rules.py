@@ -0,0 +1,37 @@
+"""SG-defect class rules shared by the dashboard and quantize-report.py"""
+import numpy as np
+
+# Class names matching any rule are treated as SG-defects (case-insensitive)
+DEFECT_RULES = {
+    'exact': ['sg-defect', 'sg_defect', 'sgdefect', 'sg defect', 'defect'],
+    'contains': ['defect', 'sg'],
+    'unknown_is_defect': False
+}
+
+
+def build_defect_lut(names, rules=None):
+    """Resolve the defect rule set once into a boolean table indexed by class id"""
+    rules = rules or DEFECT_RULES
+    exact = {name.lower() for name in rules['exact']}
+
+    # names may be a dict {id: name} (ultralytics) or a plain list
+    if isinstance(names, dict):
+        size = max(names) + 1 if names else 0
+        class_names = [names.get(i, f"Class_{i}") for i in range(size)]
+    else:
+        class_names = list(names)
+
+    # One extra trailing slot for unknown class ids
+    lut = np.zeros(len(class_names) + 1, dtype=bool)
+    for class_id, class_name in enumerate(class_names):
+        lowered = class_name.lower()
+        lut[class_id] = (lowered in exact or
+                         any(part in lowered for part in rules['contains']))
+    lut[-1] = rules['unknown_is_defect']
+    return class_names, lut
+
+
+def lookup_defects(defect_lut, cls):
+    """Boolean defect mask for an array of class ids, unknown ids hitting the trailing slot"""
+    unknown = len(defect_lut) - 1
+    return defect_lut[np.where((cls >= 0) & (cls < unknown), cls, unknown)]
@@ -0,0 +1,13 @@
+# Production server for the dashboard. Used by `python dashboard-fix.py` (unless
+# DASHBOARD_DEBUG=1) and picked up by a plain `gunicorn` run from this directory.
+#
+# One worker process: it owns the model, the cameras and every Socket.IO client, so
+# the model is loaded exactly once. Socket.IO runs in threading mode, so the worker
+# is gthread and each WebSocket connection holds one of its threads
+import os
+
+wsgi_app = 'dashboard-fix:app'
+bind = f"{os.environ.get('DASHBOARD_HOST', '0.0.0.0')}:{os.environ.get('DASHBOARD_PORT', 5000)}"
+worker_class = 'gthread'
+workers = 1
+threads = int(os.environ.get('DASHBOARD_THREADS', 100))
@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from defect_rules import build_defect_lut, lookup_defects
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_dataset(data_dir):
+    """Load labelled images laid out as <data_dir>/images/* and <data_dir>/labels/*.txt (YOLO format)"""
+    images_dir = os.path.join(data_dir, 'images')
+    labels_dir = os.path.join(data_dir, 'labels')
+    if not os.path.isdir(images_dir):
+        raise SystemExit(f"Expected labelled images in {images_dir}")
+
+    samples = []
+    for name in sorted(os.listdir(images_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(images_dir, name)
+        label_path = os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt')
+
+        labels = np.zeros((0, 5), dtype=np.float32)
+        if os.path.exists(label_path):
+            rows = [line.split() for line in open(label_path) if line.strip()]
+            if rows:
+                labels = np.array([[float(v) for v in row[:5]] for row in rows], dtype=np.float32)
+        samples.append((image_path, labels))
+
+    if not samples:
+        raise SystemExit(f"No images found in {images_dir}")
+    return samples
+
+
+def labels_to_xyxy(labels, width, height):
+    """Convert normalized YOLO labels (cls, cx, cy, w, h) to pixel xyxy boxes"""
+    cls = labels[:, 0].astype(np.int64)
+    cx, cy = labels[:, 1] * width, labels[:, 2] * height
+    w, h = labels[:, 3] * width, labels[:, 4] * height
+    return cls, np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU between two sets of xyxy boxes"""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def match_predictions(pred_boxes, pred_cls, gt_boxes, gt_cls, iou_thresholds):
+    """Greedy highest-confidence-first matching; returns (num_preds, num_thresholds) true positives"""
+    correct = np.zeros((len(pred_boxes), len(iou_thresholds)), dtype=bool)
+    if len(pred_boxes) == 0 or len(gt_boxes) == 0:
+        return correct
+
+    iou = box_iou(pred_boxes, gt_boxes)
+    iou[pred_cls[:, None] != gt_cls[None, :]] = 0
+    for t, threshold in enumerate(iou_thresholds):
+        matched_gt = set()
+        for p in range(len(pred_boxes)):  # predictions are sorted by confidence
+            candidates = np.where(iou[p] >= threshold)[0]
+            candidates = [g for g in candidates[np.argsort(-iou[p, candidates])] if g not in matched_gt]
+            if candidates:
+                matched_gt.add(candidates[0])
+                correct[p, t] = True
+    return correct
+
+
+def average_precision(correct, confidences, num_gt):
+    """All-point interpolated AP from per-prediction true positive flags"""
+    if num_gt == 0:
+        return float('nan')
+    if len(correct) == 0:
+        return 0.0
+    order = np.argsort(-confidences)
+    tp = np.cumsum(correct[order])
+    fp = np.cumsum(~correct[order])
+    recall = tp / num_gt
+    precision = tp / np.maximum(tp + fp, 1e-9)
+
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    changes = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[changes + 1] - recall[changes]) * precision[changes + 1]))
+
+
+def evaluate(model_path, samples, names, imgsz, conf, warmup=5):
+    """Run one model over the labelled set and collect accuracy and latency"""
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task='detect')
+    iou_thresholds = np.linspace(0.5, 0.95, 10)
+    # Same rule set the dashboard uses to decide which classes are SG-defects
+    defect_lut = build_defect_lut(names)[1]
+
+    # Warm up on the first image so lazy initialisation is not counted as latency
+    first = cv2.imread(samples[0][0])
+    for _ in range(warmup):
+        model.predict(first, imgsz=imgsz, conf=0.001, verbose=False)
+
+    records = {class_id: {'correct': [], 'conf': [], 'num_gt': 0} for class_id in names}
+    latencies = []
+    defect_found = defect_total = 0
+
+    for image_path, labels in samples:
+        image = cv2.imread(image_path)
+        height, width = image.shape[:2]
+
+        start_time = time.perf_counter()
+        result = model.predict(image, imgsz=imgsz, conf=0.001, verbose=False)[0]
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+        boxes = result.boxes
+        pred_boxes = boxes.xyxy.cpu().numpy()
+        pred_conf = boxes.conf.cpu().numpy()
+        pred_cls = boxes.cls.cpu().numpy().astype(np.int64)
+        order = np.argsort(-pred_conf)
+        pred_boxes, pred_conf, pred_cls = pred_boxes[order], pred_conf[order], pred_cls[order]
+
+        gt_cls, gt_boxes = labels_to_xyxy(labels, width, height)
+        correct = match_predictions(pred_boxes, pred_cls, gt_boxes, gt_cls, iou_thresholds)
+        for class_id, record in records.items():
+            mask = pred_cls == class_id
+            record['correct'].append(correct[mask])
+            record['conf'].append(pred_conf[mask])
+            record['num_gt'] += int((gt_cls == class_id).sum())
+
+        # SG-defect recall at the dashboard's operating threshold, IoU 0.5
+        for class_id in np.unique(gt_cls[lookup_defects(defect_lut, gt_cls)]):
+            gt_mask = gt_cls == class_id
+            defect_total += int(gt_mask.sum())
+            keep = (pred_conf >= conf) & (pred_cls == class_id)
+            hits = match_predictions(pred_boxes[keep], pred_cls[keep],
+                                     gt_boxes[gt_mask], gt_cls[gt_mask], [0.5])
+            defect_found += int(hits.sum())
+
+    per_class = {}
+    ap50, ap50_95 = [], []
+    for class_id, record in records.items():
+        if record['num_gt'] == 0:
+            continue
+        correct = np.concatenate(record['correct']) if record['correct'] else np.zeros((0, 10), dtype=bool)
+        confidences = np.concatenate(record['conf']) if record['conf'] else np.zeros(0)
+        aps = [average_precision(correct[:, t], confidences, record['num_gt']) for t in range(len(iou_thresholds))]
+        per_class[names[class_id]] = {'ap50': aps[0], 'ap50_95': float(np.mean(aps)), 'instances': record['num_gt']}
+        ap50.append(aps[0])
+        ap50_95.append(float(np.mean(aps)))
+
+    latencies = np.array(latencies[1:] if len(latencies) > 1 else latencies)
+    return {
+        'model': model_path,
+        'map50': float(np.mean(ap50)) if ap50 else float('nan'),
+        'map50_95': float(np.mean(ap50_95)) if ap50_95 else float('nan'),
+        'sg_defect_recall': defect_found / defect_total if defect_total else float('nan'),
+        'sg_defect_instances': defect_total,
+        'latency_ms': {
+            'mean': float(latencies.mean()),
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95))
+        },
+        'per_class': per_class
+    }
+
+
+def write_dataset_yaml(data_dir, names, path):
+    """Dataset description ultralytics needs for INT8 calibration"""
+    import yaml
+
+    with open(path, 'w') as f:
+        yaml.safe_dump({'path': os.path.abspath(data_dir), 'train': 'images', 'val': 'images',
+                        'names': {int(k): v for k, v in names.items()}}, f)
+    return path
+
+
+def letterbox(image, imgsz):
+    """Resize keeping aspect ratio and pad to a square model input"""
+    height, width = image.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    left, top = (imgsz - new_width) // 2, (imgsz - new_height) // 2
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    canvas[top:top + new_height, left:left + new_width] = cv2.resize(image, (new_width, new_height))
+    return canvas
+
+
+def export_fp32(weights, export_format, imgsz):
+    """Plain FP32 export, the same-backend baseline the INT8 model is compared against"""
+    from ultralytics import YOLO
+
+    return YOLO(weights).export(format=export_format, imgsz=imgsz)
+
+
+def quantize_openvino(weights, data_yaml, imgsz):
+    """INT8 OpenVINO export with NNCF post-training quantization"""
+    from ultralytics import YOLO
+
+    return YOLO(weights).export(format='openvino', int8=True, data=data_yaml, imgsz=imgsz)
+
+
+def quantize_onnx(fp32_path, samples, imgsz, calibration_images):
+    """ONNX Runtime static INT8 quantization of an FP32 ONNX export"""
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    int8_path = fp32_path.replace('.onnx', '_int8.onnx')
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter([path for path, _ in samples[:calibration_images]])
+
+        def get_next(self):
+            path = next(self.paths, None)
+            if path is None:
+                return None
+            blob = cv2.dnn.blobFromImage(letterbox(cv2.imread(path), imgsz), 1 / 255.0, swapRB=True)
+            return {'images': blob}
+
+    quantize_static(fp32_path, int8_path, ImageReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+    # Keep the class names/imgsz metadata the dashboard reads
+    import onnx
+    source = onnx.load(fp32_path)
+    target = onnx.load(int8_path)
+    del target.metadata_props[:]
+    target.metadata_props.extend(source.metadata_props)
+    onnx.save(target, int8_path)
+    return int8_path
+
+
+def format_report(reference, baseline, quantized, args):
+    """Side-by-side plain-text report: PyTorch FP32, exported FP32 and INT8 on the same backend"""
+    def fmt(value, pattern='{:.3f}'):
+        return 'n/a' if value != value else pattern.format(value)
+
+    columns = (reference, baseline, quantized)
+    rows = [
+        ('mAP@0.5', [fmt(c['map50']) for c in columns]),
+        ('mAP@0.5:0.95', [fmt(c['map50_95']) for c in columns]),
+        (f"SG-defect recall @conf {args.conf}", [fmt(c['sg_defect_recall']) for c in columns]),
+        ('Latency mean (ms)', [fmt(c['latency_ms']['mean'], '{:.1f}') for c in columns]),
+        ('Latency p95 (ms)', [fmt(c['latency_ms']['p95'], '{:.1f}') for c in columns]),
+    ]
+    headers = ('FP32 torch', f"FP32 {args.format}", f"INT8 {args.format}")
+    lines = [
+        f"INT8 quantization report ({datetime.now().isoformat(timespec='seconds')})",
+        f"Weights:   {args.weights}",
+        f"FP32:      {baseline['model']}",
+        f"Quantized: {quantized['model']}",
+        f"Images:    {args.data} ({reference['sg_defect_instances']} SG-defect instances)",
+        '',
+        f"{'Metric':<32}" + ''.join(f"{header:>16}" for header in headers),
+    ]
+    lines += [f"{name:<32}" + ''.join(f"{value:>16}" for value in values) for name, values in rows]
+
+    # Quantization alone is INT8 vs FP32 on the same backend; vs PyTorch includes the backend change
+    speedup = baseline['latency_ms']['mean'] / max(quantized['latency_ms']['mean'], 1e-9)
+    overall = reference['latency_ms']['mean'] / max(quantized['latency_ms']['mean'], 1e-9)
+    lines += ['', f"Speedup from INT8: {speedup:.2f}x (vs FP32 {args.format})",
+              f"Speedup vs PyTorch: {overall:.2f}x"]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize YOLO weights to INT8 and compare accuracy and speed")
+    parser.add_argument('weights', help="PyTorch weights, e.g. testing.pt or new-oppo.pt")
+    parser.add_argument('--data', required=True, help="Folder with images/ and YOLO-format labels/")
+    parser.add_argument('--format', choices=['openvino', 'onnx'], default='openvino')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.5, help="Dashboard confidence threshold for SG-defect recall")
+    parser.add_argument('--calibration-images', type=int, default=300)
+    parser.add_argument('--max-recall-drop', type=float, default=0.0,
+                        help="Fail if INT8 SG-defect recall is lower than FP32 by more than this")
+    parser.add_argument('--report', help="Write the JSON report here (default: next to the artifact)")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    samples = load_dataset(args.data)
+    names = YOLO(args.weights).names
+
+    print(f"Exporting {args.weights} to FP32 {args.format}...")
+    fp32_artifact = export_fp32(args.weights, args.format, args.imgsz)
+
+    print(f"Quantizing {args.weights} to INT8 ({args.format})...")
+    if args.format == 'openvino':
+        with tempfile.TemporaryDirectory() as tmp:
+            data_yaml = write_dataset_yaml(args.data, names, os.path.join(tmp, 'data.yaml'))
+            artifact = quantize_openvino(args.weights, data_yaml, args.imgsz)
+    else:
+        artifact = quantize_onnx(fp32_artifact, samples, args.imgsz, args.calibration_images)
+
+    print(f"Evaluating on {len(samples)} images...")
+    reference = evaluate(args.weights, samples, names, args.imgsz, args.conf)
+    baseline = evaluate(fp32_artifact, samples, names, args.imgsz, args.conf)
+    quantized = evaluate(artifact, samples, names, args.imgsz, args.conf)
+
+    print(format_report(reference, baseline, quantized, args))
+
+    report_path = args.report or os.path.join(os.path.dirname(os.path.abspath(artifact)),
+                                              'quantization_report.json')
+    with open(report_path, 'w') as f:
+        json.dump({'torch_fp32': reference, 'fp32': baseline, 'int8': quantized,
+                   'conf': args.conf, 'imgsz': args.imgsz}, f, indent=2)
+    print(f"Report written to {report_path}")
+
+    # Without labelled defects the recall check below would pass on NaN
+    if reference['sg_defect_instances'] == 0:
+        print(f"No SG-defect instances in {args.data}, recall can't be checked; do not deploy {artifact}")
+        sys.exit(1)
+
+    # Recall is held to the PyTorch weights, the accuracy the line was validated with
+    recall_drop = reference['sg_defect_recall'] - quantized['sg_defect_recall']
+    if recall_drop > args.max_recall_drop:
+        print(f"SG-defect recall dropped by {recall_drop:.3f} (allowed {args.max_recall_drop}), "
+              f"do not deploy {artifact}")
+        sys.exit(1)
+
+    backend = 'openvino' if args.format == 'openvino' else 'onnxruntime'
+    print(f"Run the dashboard on it with: DASHBOARD_MODEL={artifact} DASHBOARD_BACKEND={backend}")
+
+
+if __name__ == '__main__':
+    main()